@@ -1,24 +1,75 @@
-from fastapi import APIRouter, Response
+from fastapi import APIRouter, HTTPException, Response, Header, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Optional
 import os
-from dotenv import load_dotenv
-from functools import lru_cache
-
-load_dotenv()
+import asyncio
+from core.photo_store import get_photo_path, photo_key
+from core.photo_fetch import start_photo_fetch
+from core.database import photo_prefetch_col
+from api.models import PyObjectId
 
 router = APIRouter(prefix="/plans", tags=["Plans"])
 
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+# Dozwolone szerokości - każda to osobny wariant w cache
+PHOTO_WIDTHS = (100, 200, 400, 800, 1600)
+PHOTO_MAX_AGE_SECONDS = int(os.getenv("PHOTO_MAX_AGE_SECONDS", str(30 * 24 * 3600)))
+
+
+def snap_photo_width(maxwidth: int) -> int:
+    for width in PHOTO_WIDTHS:
+        if maxwidth <= width:
+            return width
+    return PHOTO_WIDTHS[-1]
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str, stored: bool) -> bool:
+    # "*" only matches when there is a representation - a photo already on disk
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates or ("*" in candidates and stored)
 
-@lru_cache(maxsize=1000)
-def get_google_photo_bytes(photoreference: str) -> bytes:
-    import requests
-    url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photoreference={photoreference}&key={GOOGLE_MAPS_API_KEY}"
-    r = requests.get(url, allow_redirects=True)
-    if r.status_code != 200:
-        return b""
-    return r.content
 
 @router.get("/proxy/photo")
-def proxy_photo(photoreference: str):
-    photo_bytes = get_google_photo_bytes(photoreference)
-    return Response(content=photo_bytes, media_type="image/jpeg")
+async def proxy_photo(
+    photoreference: str,
+    maxwidth: int = Query(800, ge=1, le=1600),
+    if_none_match: Optional[str] = Header(None)
+):
+    maxwidth = snap_photo_width(maxwidth)
+    # The bytes behind a (photoreference, width) pair never change, so the key is a strong ETag
+    etag = f'"{photo_key(photoreference, maxwidth)}"'
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PHOTO_MAX_AGE_SECONDS}, immutable",
+    }
+
+    if _etag_matches(if_none_match, etag, stored=False):
+        return Response(status_code=304, headers=cache_headers)
+
+    path = await asyncio.to_thread(get_photo_path, photoreference, maxwidth)
+    if path is not None:
+        if _etag_matches(if_none_match, etag, stored=True):
+            return Response(status_code=304, headers=cache_headers)
+        # Served straight from disk (sendfile where the server supports it)
+        return FileResponse(path, media_type="image/jpeg", headers=cache_headers)
+
+    fetch = start_photo_fetch(photoreference, maxwidth)
+    await fetch.headers_ready.wait()
+    if fetch.status_code != 200:
+        return Response(status_code=502)
+    return StreamingResponse(fetch.stream(), media_type="image/jpeg", headers=cache_headers)
+
+
+@router.get("/{trip_id}/photo-prefetch")
+async def get_photo_prefetch_progress(trip_id: str):
+    try:
+        object_id = PyObjectId(trip_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ID format: {e}")
+
+    progress = await photo_prefetch_col.find_one({"trip_id": object_id}, {"_id": 0})
+    if not progress:
+        raise HTTPException(status_code=404, detail="No photo prefetch for this plan")
+    progress["trip_id"] = str(progress["trip_id"])
+    return progress
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Body
 from api.models import PlanBase, PlanDB, PyObjectId
 from core.database import plans_col
+from enrich import enrich_plan_incrementally
 from datetime import datetime
 from bson import ObjectId
 
@@ -32,8 +33,14 @@ async def create_plan(plan: PlanBase):
 async def update_plan(plan_id: str, plan: PlanBase):
     """
     Update an existing plan by its ID.
+    Only activities with a changed location are geocoded again.
     """
+    stored_plan = await plans_col.find_one({"_id": ObjectId(plan_id)}, {"data": 1})
+    if not stored_plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
     plan_dict = plan.model_dump(by_alias=True)
+    plan_dict["data"] = await enrich_plan_incrementally(plan_dict["data"], stored_plan.get("data", {}))
     plan_dict["updated_at"] = datetime.utcnow()
 
     result = await plans_col.update_one(
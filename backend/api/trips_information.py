@@ -39,7 +39,7 @@ async def update_plan_by_trip_id(trip_id: str, data: dict = Body(...)):
         trip_object_id = PyObjectId(trip_id)
         result = await trips_information_col.update_one(
             {"trip_id": trip_object_id},
-            {"$set": {"data": data, "updated_at": datetime.utcnow()}}
+            {"$set": {"data": data, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
         )
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Plan not found or not modified")
@@ -0,0 +1,124 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import each app,
+which modules that time goes to, and what the lazily built clients cost on
+first use. Fails (exit 1) when a number goes over cold_start_budget.json.
+
+Run from the backend directory:
+    python benchmarks/cold_start_bench.py
+    python benchmarks/cold_start_bench.py --runs 5 --top 25
+    python benchmarks/cold_start_bench.py --no-budget
+
+Every measurement runs in its own subprocess, so nothing is already in
+sys.modules. Needs only TOGETHER_API_KEY / GOOGLE_MAPS_API_KEY to be set to
+anything - no network calls are made (LLM_BACKEND=fake).
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cold_start_budget.json")
+
+APPS = ("togetherai", "main")
+
+LAZY_GETTERS = {
+    "chat_chain": "from chains.chat_chain import get_chat_chain as getter",
+    "plan_generator_llm": "from chains.plan_generator_chain import get_plan_generator_llm as getter",
+    "information_update_chain": "from chains.information_update_chain import get_information_update_chain as getter",
+    "summary_chain": "from chains.summary_chain import get_summary_chain as getter",
+    "gmaps": "from enrich import get_gmaps as getter",
+    "token_encoding": "from chains.prompt_budget import get_token_encoding as getter",
+}
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "fake")
+    env.setdefault("TOGETHER_API_KEY", "offline")
+    env.setdefault("GOOGLE_MAPS_API_KEY", "AIza" + "0" * 35)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def time_import(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    return float(_run(code).stdout.strip().splitlines()[-1])
+
+
+def time_first_use(import_line: str) -> float:
+    code = f"{import_line}\nimport time; t = time.perf_counter(); getter(); print(time.perf_counter() - t)"
+    return float(_run(code).stdout.strip().splitlines()[-1])
+
+
+def top_imports(module: str, top: int) -> list:
+    """
+    (seconds, package) of the slowest packages, from `python -X importtime`:
+    the self time of every module is added to its top-level package, so
+    each package is charged for its own modules wherever they were imported.
+    """
+    stderr = _run(f"import {module}", importtime=True).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1_000_000
+    return sorted(((seconds, package) for package, seconds in packages.items()), reverse=True)[:top]
+
+
+def check_budget(results: dict) -> list:
+    with open(BUDGET_PATH, encoding="utf-8") as f:
+        budget = json.load(f)
+    over = []
+    for section, limits in budget.items():
+        for name, limit in limits.items():
+            value = results.get(section, {}).get(name)
+            if value is not None and value > limit:
+                over.append(f"{section}.{name}: {value:.3f} s > {limit:.3f} s")
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3, help="fresh imports per app, the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="how many packages to list per app")
+    parser.add_argument("--no-budget", action="store_true", help="only report, do not compare with the budget")
+    args = parser.parse_args()
+
+    results = {"import": {}, "first_use": {}}
+    for app in APPS:
+        timings = [time_import(app) for _ in range(args.runs)]
+        results["import"][app] = statistics.median(timings)
+        print(f"\n{app}: import {results['import'][app]:.3f} s (median of {args.runs}, min {min(timings):.3f} s)")
+        for seconds, package in top_imports(app, args.top):
+            print(f"  {seconds:8.3f} s  {package}")
+
+    print("\nFirst use of lazily built clients (import of their module excluded):")
+    for name, import_line in LAZY_GETTERS.items():
+        results["first_use"][name] = time_first_use(import_line)
+        print(f"  {results['first_use'][name]:8.3f} s  {name}")
+
+    if args.no_budget:
+        return
+    over = check_budget(results)
+    for line in over:
+        print(f"🔴 Over budget: {line}")
+    if over:
+        sys.exit(1)
+    print("\n🟢 Within the cold-start budget")
+
+
+if __name__ == "__main__":
+    main()
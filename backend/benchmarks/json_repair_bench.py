@@ -0,0 +1,137 @@
+"""
+Benchmark and fuzz run for travelplan.json_repair.
+
+Run from the backend directory:
+    python benchmarks/json_repair_bench.py
+    python benchmarks/json_repair_bench.py --fuzz 5000 --seed 7
+
+Every .txt file in benchmarks/corpus/json_repair is a real-looking broken
+model output and must parse to the value in the .expected.json file next to
+it. The fuzz run mutates a valid plan (truncation,
+trailing commas, Python literals, dropped characters) and checks that
+parse_llm_json never raises anything other than JsonRepairError.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from travelplan.json_repair import parse_llm_json, JsonRepairError
+from travelplan.traveljson import get_empty_plan2
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "json_repair")
+
+
+def sample_plan(days: int = 7) -> str:
+    plan = parse_llm_json(get_empty_plan2())
+    plan.update({
+        "trip_name": "Sample trip",
+        "start_date": "2025-06-01",
+        "end_date": "2025-06-07",
+        "duration_days": days,
+        "destination_country": "Italy",
+        "destination_cities": ["Rome", "Florence"],
+    })
+    day_template = plan["daily_plan"][0]
+    plan["daily_plan"] = []
+    for day in range(1, days + 1):
+        entry = json.loads(json.dumps(day_template))
+        entry.update({"day": day, "date": f"2025-06-0{day}", "city": "Rome", "summary": "Walk, eat, \"repeat\"."})
+        entry["activities"] = [
+            {"time": f"{9 + i}:00", "title": f"Stop {i}", "location_name": f"Place {i}",
+             "description": "A short description of the stop.", "type": "sightseeing", "tags": ["outdoor"]}
+            for i in range(4)
+        ]
+        plan["daily_plan"].append(entry)
+    return json.dumps(plan, indent=2, ensure_ascii=False)
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    kind = rng.choice(["truncate", "trailing_comma", "python", "drop", "newline", "fence"])
+    if kind == "truncate":
+        return text[:rng.randrange(1, len(text))]
+    if kind == "trailing_comma":
+        return text.replace("}", ",}", rng.randint(1, 20)).replace("]", ",]", rng.randint(1, 5))
+    if kind == "python":
+        return text.replace("null", "None").replace("true", "True").replace("false", "False")
+    if kind == "drop":
+        chars = list(text)
+        for _ in range(rng.randint(1, 10)):
+            del chars[rng.randrange(len(chars))]
+        return "".join(chars)
+    if kind == "newline":
+        return text.replace("A short", "A\nshort")
+    return f"```json\n{text}\n```\nEnjoy your trip!"
+
+
+def run_corpus() -> bool:
+    ok = True
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+            text = f.read()
+        with open(os.path.join(CORPUS_DIR, name[:-len(".txt")] + ".expected.json"), encoding="utf-8") as f:
+            expected = json.load(f)
+        try:
+            parsed = parse_llm_json(text)
+        except JsonRepairError as e:
+            ok = False
+            print(f"🔴 {name}: {e}")
+            continue
+        if parsed == expected:
+            print(f"✅ {name}")
+        else:
+            ok = False
+            print(f"🔴 {name}: got {json.dumps(parsed, ensure_ascii=False)}")
+    return ok
+
+
+def run_benchmark(iterations: int):
+    valid = sample_plan()
+    broken = {
+        "valid": valid,
+        "trailing_commas": valid.replace("}", ",}").replace("]", ",]"),
+        "truncated": valid[:len(valid) * 2 // 3],
+    }
+    for label, text in broken.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            parse_llm_json(text)
+        per_call = (time.perf_counter() - started) / iterations * 1000
+        print(f"{label:16} {len(text):6} chars  {per_call:7.3f} ms/parse")
+
+
+def run_fuzz(cases: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    valid = sample_plan()
+    parsed = rejected = 0
+    for _ in range(cases):
+        text = mutate(valid, rng)
+        try:
+            parse_llm_json(text)
+            parsed += 1
+        except JsonRepairError:
+            rejected += 1
+        except Exception as e:
+            print(f"🔴 Unexpected {type(e).__name__}: {e}\n{text[:200]!r}")
+            return False
+    print(f"Fuzz: {parsed}/{cases} parsed, {rejected} rejected")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--fuzz", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus_ok = run_corpus()
+    run_benchmark(args.iterations)
+    fuzz_ok = run_fuzz(args.fuzz, args.seed)
+    sys.exit(0 if corpus_ok and fuzz_ok else 1)
@@ -0,0 +1,123 @@
+"""
+Offline throughput/latency benchmark of the LLM pipeline: chat turns,
+information updates and plan generation (single completion and fan-out)
+running side by side through the shared governor.
+
+Run from the backend directory:
+    python benchmarks/pipeline_bench.py
+    python benchmarks/pipeline_bench.py --users 20 --rounds 3
+    LLM_BACKEND=replay python benchmarks/pipeline_bench.py
+
+Uses the scripted fake model unless LLM_BACKEND is set. With
+LLM_FAKE_LATENCY_SECONDS / LLM_FAKE_TOKENS_PER_SECOND the fake can be
+tuned to the provider's real numbers; the governor limits (LLM_*_PER_MINUTE,
+LLM_MAX_CONCURRENCY) apply exactly as in production. Nothing is written to
+Mongo: the LLM cache is off for offline backends.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("TOGETHER_API_KEY", "offline")
+
+from chains.llm_backend import LLM_BACKEND, is_offline_backend
+from chains.chat_chain import get_chat_chain
+from chains.information_update_chain import get_information_update_chain
+from chains.plan_generator_chain import get_plan_generator_llm, json2_skeleton
+from chains.prompt_budget import assemble_chat_inputs
+from chains.governor import get_governor_stats
+from travelplan.json_repair import parse_llm_json
+from plan_fanout import generate_plan_fanout
+
+TRAVEL_INFORMATION = {
+    "destination_countries": ["Italy"],
+    "destination_cities": ["Rome"],
+    "start_date": "2025-06-01",
+    "end_date": "2025-06-05",
+    "duration_days": 5,
+}
+
+
+async def chat_turn(user: int):
+    inputs = assemble_chat_inputs(f"User {user}: I would like to visit Rome in June", TRAVEL_INFORMATION, "", [])
+    await get_chat_chain().ainvoke(inputs)
+
+
+async def information_update(user: int):
+    await get_information_update_chain().arun(
+        last_user_message=f"User {user}: we are two adults",
+        message_history="[]",
+        current_plan=json.dumps(TRAVEL_INFORMATION)
+    )
+
+
+async def plan_single(user: int):
+    prompt = (
+        "Generate a short travel plan based on the data from TRAVEL INFORMATION.\n"
+        f"TRAVEL INFORMATION:\n{json.dumps(TRAVEL_INFORMATION)}\nUSER: {user}\nJSON:\n{json2_skeleton}"
+    )
+    response = await get_plan_generator_llm().ainvoke(prompt)
+    parse_llm_json(response.content)
+
+
+async def plan_fanout(user: int):
+    await generate_plan_fanout(TRAVEL_INFORMATION, f"User {user}", bypass_cache=True)
+
+
+SCENARIOS = {
+    "chat": chat_turn,
+    "information_update": information_update,
+    "plan_single": plan_single,
+    "plan_fanout": plan_fanout,
+}
+
+
+async def timed(kind: str, user: int, results: dict):
+    started = time.perf_counter()
+    try:
+        await SCENARIOS[kind](user)
+        results[kind].append(time.perf_counter() - started)
+    except Exception as e:
+        results.setdefault("errors", []).append(f"{kind}: {type(e).__name__}: {e}")
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+async def run(users: int, rounds: int, scenarios: list):
+    results = {kind: [] for kind in scenarios}
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(timed(kind, user, results) for user in range(users) for kind in scenarios))
+    elapsed = time.perf_counter() - started
+
+    print(f"\nBackend: {LLM_BACKEND}, {users} users x {rounds} rounds, {elapsed:.2f} s total")
+    print(f"{'scenario':20} {'runs':>5} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'per s':>8}")
+    for kind in scenarios:
+        latencies = results[kind]
+        print(
+            f"{kind:20} {len(latencies):5} {percentile(latencies, 0.5):8.3f} {percentile(latencies, 0.95):8.3f} "
+            f"{max(latencies, default=0):8.3f} {len(latencies) / elapsed:8.2f}"
+        )
+    for error in results.get("errors", [])[:10]:
+        print(f"🔴 {error}")
+    print("\nGovernor:", json.dumps(get_governor_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    if not is_offline_backend():
+        print(f"⚠️ LLM_BACKEND={LLM_BACKEND} calls the real API")
+    asyncio.run(run(args.users, args.rounds, args.scenarios))
@@ -19,38 +19,16 @@
 
 # # chat_chain = LLMChain(llm=chat_llm, prompt=chat_llm_prompt, memory=memory)
 
+from functools import lru_cache
 from dotenv import load_dotenv
-from datetime import datetime, date, timedelta
-from dateutil.parser import parse as parse_date
 
-from langchain_together import ChatTogether
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.tools import Tool, StructuredTool
-
-from langchain.agents import create_react_agent
-
-from chains.tools.weather import current_weather_tool, forecast_weather_tool
-from chains.tools.flights import flight_searcher_tool
-from chains.tools.today import today_tool
-from chains.tools.hotels import hotel_searcher_tool
+from chains.llm_backend import make_chat_model
+from chains.prompt_budget import render_tools_within_budget
 
 load_dotenv()
 
-tools = [current_weather_tool, forecast_weather_tool, flight_searcher_tool, today_tool, hotel_searcher_tool]
-
-chat_llm = ChatTogether(
-    model="deepseek-ai/DeepSeek-V3",
-    temperature=0.2,
-    max_tokens=2048
-)
-
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True,
-    input_key="input"
-)
+# Historia rozmowy nie jest trzymana w procesie - każde wywołanie dostaje
+# chat_history danej podróży z chains.chat_memory.load_chat_history
 
 
 template = """
@@ -94,23 +72,46 @@ New input: {input}
 
 
 
-prompt = PromptTemplate(
-    input_variables=["input", "tools", "tool_names", "chat_history", "agent_scratchpad", "trip_gathered_information"],
-    template=template
-)
-
-agent = create_react_agent(
-    llm=chat_llm,
-    tools=tools,
-    prompt=prompt
-)
-
-chat_chain = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    memory=memory,
-    verbose=True,
-    handle_parsing_errors=True,
-    max_iterations=5,
-    return_intermediate_steps=True
-)
+@lru_cache(maxsize=None)
+def get_chat_chain():
+    """
+    The ReAct agent with its tools, built on first use. langchain.agents,
+    the tools and the Together client take seconds to import, so they are
+    not paid for at startup.
+    """
+    from langchain.agents import create_react_agent, AgentExecutor
+    from langchain_core.prompts import PromptTemplate
+    from chains.tools.weather import current_weather_tool, forecast_weather_tool
+    from chains.tools.flights import flight_searcher_tool
+    from chains.tools.today import today_tool
+    from chains.tools.hotels import hotel_searcher_tool
+
+    tools = [current_weather_tool, forecast_weather_tool, flight_searcher_tool, today_tool, hotel_searcher_tool]
+
+    chat_llm = make_chat_model(
+        lane="chat",
+        model="deepseek-ai/DeepSeek-V3",
+        temperature=0.2,
+        max_tokens=2048
+    )
+
+    prompt = PromptTemplate(
+        input_variables=["input", "tools", "tool_names", "chat_history", "agent_scratchpad", "trip_gathered_information"],
+        template=template
+    )
+
+    agent = create_react_agent(
+        llm=chat_llm,
+        tools=tools,
+        prompt=prompt,
+        tools_renderer=render_tools_within_budget
+    )
+
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        handle_parsing_errors=True,
+        max_iterations=5,
+        return_intermediate_steps=True
+    )
@@ -0,0 +1,77 @@
+import os
+from datetime import datetime
+from bson import ObjectId
+from core.database import messages_col, chat_summaries_col
+from chains.summary_chain import get_summary_chain
+
+# Ile ostatnich wiadomości trafia do promptu dosłownie; starsze są streszczane
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "8"))
+# Streszczamy dopiero gdy poza oknem zbierze się tyle nowych wiadomości
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "6"))
+CHAT_SUMMARY_MAX_MESSAGES = 40
+
+
+def _format_messages(messages: list) -> str:
+    return "\n".join(f"{'Human' if msg.get('isUser') else 'AI'}: {msg.get('text', '')}" for msg in messages)
+
+
+async def load_chat_history(trip_id: str, current_input: str = None):
+    """
+    Conversation history for one trip: the rolling summary (or None) and the
+    last CHAT_HISTORY_WINDOW messages from messages_col, formatted one per entry.
+    """
+    trip_object_id = ObjectId(trip_id)
+    summary_doc = await chat_summaries_col.find_one({"trip_id": trip_object_id})
+    recent = await messages_col.find({"trip_id": trip_object_id}).sort("timestamp", -1).to_list(length=CHAT_HISTORY_WINDOW + 1)
+    recent.reverse()
+
+    # The client may already have stored the message we are answering
+    if recent and recent[-1].get("isUser") and recent[-1].get("text") == current_input:
+        recent = recent[:-1]
+    recent = recent[-CHAT_HISTORY_WINDOW:]
+
+    summary = summary_doc.get("summary") if summary_doc else None
+    return summary, [_format_messages([msg]) for msg in recent]
+
+
+async def update_chat_summary(trip_id: str):
+    """
+    Fold messages that fell out of the history window into the trip's
+    rolling summary. Runs in the background after a chat turn.
+    """
+    trip_object_id = ObjectId(trip_id)
+    window = await messages_col.find({"trip_id": trip_object_id}).sort("timestamp", -1).to_list(length=CHAT_HISTORY_WINDOW)
+    if len(window) < CHAT_HISTORY_WINDOW:
+        return
+    window_start = window[-1]["timestamp"]
+
+    summary_doc = await chat_summaries_col.find_one({"trip_id": trip_object_id}) or {}
+    timestamp_filter = {"$lt": window_start}
+    if summary_doc.get("summarized_until"):
+        timestamp_filter["$gt"] = summary_doc["summarized_until"]
+
+    pending = await messages_col.find(
+        {"trip_id": trip_object_id, "timestamp": timestamp_filter}
+    ).sort("timestamp", 1).to_list(length=CHAT_SUMMARY_MAX_MESSAGES)
+    if len(pending) < CHAT_SUMMARY_BATCH:
+        return
+
+    try:
+        summary = await get_summary_chain().arun(
+            summary=summary_doc.get("summary") or "(none)",
+            messages=_format_messages(pending)
+        )
+    except Exception as e:
+        print(f"⚠️ Chat summary update failed for trip_id {trip_id}: {e}")
+        return
+
+    await chat_summaries_col.update_one(
+        {"trip_id": trip_object_id},
+        {"$set": {
+            "summary": summary.strip(),
+            "summarized_until": pending[-1]["timestamp"],
+            "updated_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+    print(f"📝 Chat summary updated for trip_id: {trip_id} (+{len(pending)} messages)")
@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from chains.prompt_budget import count_tokens
+
+# Limity konta Together - wspólne dla wszystkich łańcuchów w procesie
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "180000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Highest priority first
+LANES = ("chat", "plan", "background")
+LLM_MAX_QUEUE = {
+    "chat": int(os.getenv("LLM_MAX_QUEUE_CHAT", "50")),
+    "plan": int(os.getenv("LLM_MAX_QUEUE_PLAN", "40")),
+    "background": int(os.getenv("LLM_MAX_QUEUE_BACKGROUND", "20")),
+}
+
+
+class GovernorBusy(RuntimeError):
+    def __init__(self, lane: str, retry_after: float):
+        super().__init__(f"Too many queued LLM calls in the {lane} lane")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.rate = self.capacity / 60
+        self.level = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        # Negative amounts charge for usage above the estimate
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateGovernor:
+    """
+    Admits LLM calls under request/token budgets and a concurrency cap.
+    Waiting calls are served strictly by lane priority, so a queue of
+    background updates never delays a chat turn. When a lane's queue is
+    full, new calls fail fast with GovernorBusy instead of piling up.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int, max_queue: dict):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.running = 0
+        self.queues = {lane: deque() for lane in LANES}
+        self.stats = {
+            lane: {"admitted": 0, "rejected": 0, "wait_seconds": deque(maxlen=500)}
+            for lane in LANES
+        }
+        self._timer = None
+
+    def _dispatch(self):
+        self._timer = None
+        while self.running < self.max_concurrency:
+            lane = next((lane for lane in LANES if self.queues[lane]), None)
+            if lane is None:
+                return
+            waiter, tokens, enqueued_at = self.queues[lane][0]
+            if waiter.done():
+                self.queues[lane].popleft()
+                continue
+
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                # Lower lanes do not jump ahead - they would eat the budget the head is waiting for
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            self.queues[lane].popleft()
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.running += 1
+            self.stats[lane]["admitted"] += 1
+            self.stats[lane]["wait_seconds"].append(time.monotonic() - enqueued_at)
+            waiter.set_result(None)
+
+    async def acquire(self, lane: str, tokens: int):
+        if lane not in self.queues:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        queue = self.queues[lane]
+        if len(queue) >= self.max_queue[lane]:
+            self.stats[lane]["rejected"] += 1
+            raise GovernorBusy(lane, retry_after=max(1.0, len(queue) / self.requests.rate))
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append((waiter, tokens, time.monotonic()))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted right before the caller gave up
+                self.release(tokens, tokens)
+            else:
+                for entry in queue:
+                    if entry[0] is waiter:
+                        queue.remove(entry)
+                        break
+            raise
+
+    def release(self, estimated: int, used: int = None):
+        self.running -= 1
+        if used is not None:
+            self.tokens.give_back(estimated - used)
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str, tokens: int):
+        await self.acquire(lane, tokens)
+        usage = {"total_tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(tokens, usage["total_tokens"])
+
+    def get_stats(self) -> dict:
+        lanes = {}
+        for lane in LANES:
+            waits = sorted(self.stats[lane]["wait_seconds"])
+            lanes[lane] = {
+                "queued": len(self.queues[lane]),
+                "admitted": self.stats[lane]["admitted"],
+                "rejected": self.stats[lane]["rejected"],
+                "wait_p50_seconds": round(waits[len(waits) // 2], 3) if waits else 0,
+                "wait_p95_seconds": round(waits[int(len(waits) * 0.95)], 3) if waits else 0,
+                "wait_max_seconds": round(waits[-1], 3) if waits else 0,
+            }
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "request_budget_left": round(self.requests.level, 1),
+            "token_budget_left": round(self.tokens.level),
+            "lanes": lanes,
+        }
+
+
+governor = RateGovernor(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE)
+
+
+def get_governor_stats() -> dict:
+    return governor.get_stats()
+
+
+class GovernedChatModel:
+    """
+    Mixin for chat models: async calls go through the shared governor in the model's `lane`.
+    """
+
+    def _estimate_tokens(self, messages) -> int:
+        prompt = "".join(str(message.content) for message in messages)
+        return count_tokens(prompt) + (self.max_tokens or 0)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with governor.slot(self.lane, self._estimate_tokens(messages)) as usage:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            usage["total_tokens"] = ((result.llm_output or {}).get("token_usage") or {}).get("total_tokens")
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with governor.slot(self.lane, self._estimate_tokens(messages)) as usage:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage_metadata = getattr(chunk.message, "usage_metadata", None)
+                if usage_metadata:
+                    usage["total_tokens"] = usage_metadata.get("total_tokens")
+                yield chunk
@@ -1,24 +1,23 @@
-from langchain_together import ChatTogether
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-
-information_llm = ChatTogether(
-    model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
-    temperature=0.7,
-    max_tokens=512
-)
-
-information_llm_prompt = PromptTemplate(
-    input_variables=["last_user_message", "message_history", "current_plan"],
-    template="""
+from functools import lru_cache
+from chains.llm_backend import make_chat_model
+
+information_llm_template = """
 You are a travel plan updater.
 
 Your task is to update the existing travel plan JSON **only based on the last user answer**. 
 Use the conversation history **only for context** if needed, but do not use assistant messages as source of truth.
 
+Do NOT repeat the plan. Output only a JSON Patch (RFC 6902): a JSON array of operations
+that turns the current plan into the updated one.
+
 - Make only minimal and necessary edits.
-- If information is missing, leave it empty.
-- Output must be a valid, complete JSON.
+- Use "replace" for existing fields, "add" with a "/-" path to append to a list, "remove" to delete.
+- Paths must point into the current plan, e.g. "/start_date", "/destination_cities/-", "/accommodation/0/city".
+- Do not add fields that are not in the current plan.
+- If nothing needs to change, output [].
+
+Example:
+[{{"op": "replace", "path": "/start_date", "value": "2025-07-01"}}, {{"op": "add", "path": "/destination_cities/-", "value": "Rome"}}]
 
 Last user answer:
 {last_user_message}
@@ -29,8 +28,22 @@ Conversation history (last 3 messages for context):
 Current plan JSON:
 {current_plan}
 
-Updated plan JSON:
+JSON Patch:
 """
-)
 
-information_update_chain = LLMChain(llm=information_llm, prompt=information_llm_prompt)
+
+@lru_cache(maxsize=None)
+def get_information_update_chain():
+    from langchain.chains import LLMChain
+    from langchain_core.prompts import PromptTemplate
+
+    information_llm = make_chat_model(
+        lane="background",
+        model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
+        temperature=0.7,
+        max_tokens=512
+    )
+    return LLMChain(llm=information_llm, prompt=PromptTemplate(
+        input_variables=["last_user_message", "message_history", "current_plan"],
+        template=information_llm_template
+    ))
@@ -0,0 +1,157 @@
+import os
+import re
+import json
+import hashlib
+from datetime import datetime
+
+# together - prawdziwe API, fake - skryptowany model offline,
+# record - prawdziwe API + zapis rozmów na dysk, replay - odtwarzanie zapisanych rozmów
+LLM_BACKEND = os.getenv("LLM_BACKEND", "together")
+LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "llm_cassettes"))
+LLM_FAKE_LATENCY_SECONDS = float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0.3"))
+LLM_FAKE_TOKENS_PER_SECOND = float(os.getenv("LLM_FAKE_TOKENS_PER_SECOND", "60"))
+# Optional JSON file: [{"match": "<regex>", "response": "<text>"}, ...], checked before the built-in script
+LLM_FAKE_SCRIPT = os.getenv("LLM_FAKE_SCRIPT")
+# Sleep for the recorded latency when replaying
+LLM_REPLAY_REALTIME = os.getenv("LLM_REPLAY_REALTIME", "0") == "1"
+
+BACKENDS = ("together", "fake", "record", "replay")
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+def is_offline_backend() -> bool:
+    return LLM_BACKEND in ("fake", "replay")
+
+
+def check_llm_config():
+    """
+    What make_chat_model will need, checked without building a model, so a
+    bad configuration fails at startup rather than on the first message.
+    """
+    if LLM_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}, expected one of: {', '.join(BACKENDS)}")
+    if LLM_BACKEND in ("together", "record") and not os.getenv("TOGETHER_API_KEY"):
+        raise ValueError("TOGETHER_API_KEY is not set")
+
+
+def _serialize_messages(messages) -> list:
+    return [{"type": message.type, "content": message.content} for message in messages]
+
+
+def exchange_key(model_name: str, temperature, max_tokens, messages, stop=None) -> str:
+    key_source = {
+        "model": model_name,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "messages": _serialize_messages(messages),
+        "stop": stop or [],
+    }
+    return hashlib.sha256(json.dumps(key_source, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def cut_at_stop(text: str, stop) -> str:
+    for sequence in stop or []:
+        position = text.find(sequence)
+        if position != -1:
+            text = text[:position]
+    return text
+
+
+def split_for_stream(text: str) -> list:
+    return re.findall(r"\s*\S+\s*", text) or [text]
+
+
+def _fake_day(day: int) -> dict:
+    return {
+        "day": day,
+        "date": f"2025-06-{day:02d}",
+        "city": "Rome",
+        "summary": f"Day {day} in Rome.",
+        "accommodation": {"hotel_name": "Hotel Artemide", "check_in": "15:00", "address": "Via Nazionale 22, Rome"},
+        "activities": [
+            {"time": "09:00", "title": "Colosseum", "location_name": "Colosseum",
+             "description": "Guided tour of the arena.", "type": "sightseeing", "tags": ["history"]},
+            {"time": "13:00", "title": "Lunch in Monti", "location_name": "Monti, Rome",
+             "description": "Pasta in a local trattoria.", "type": "food", "tags": ["food"]},
+            {"time": "16:00", "title": "Trevi Fountain", "location_name": "Trevi Fountain",
+             "description": "Evening walk through the centre.", "type": "sightseeing", "tags": ["walk"]},
+        ],
+        "notes": None,
+    }
+
+
+_FAKE_TRIP = {
+    "trip_name": "Five days in Rome",
+    "start_date": "2025-06-01",
+    "end_date": "2025-06-05",
+    "duration_days": 5,
+    "destination_country": "Italy",
+    "destination_cities": ["Rome"],
+    "general_notes": ["Carry water, it is hot in June."],
+    "emergency_contacts": [{"name": "Emergency", "phone": "112", "type": "emergency"}],
+}
+
+# (regex over the whole prompt, response) - first match wins
+DEFAULT_FAKE_SCRIPT = [
+    (r"Plan the outline of a trip", json.dumps({
+        **_FAKE_TRIP,
+        "days": [{"day": day, "date": f"2025-06-{day:02d}", "city": "Rome", "theme": "Ancient Rome"} for day in range(1, 6)],
+    })),
+    (r"Write the detailed plan of ONE day", json.dumps(_fake_day(1))),
+    (r"Generate a short travel plan", json.dumps({**_FAKE_TRIP, "daily_plan": [_fake_day(day) for day in range(1, 6)]})),
+    (r"JSON Patch", '[{"op": "add", "path": "/destination_cities/-", "value": "Rome"}]'),
+    (r"running summary", "The user is planning five days in Rome in June."),
+    (r"New input:", "Thought: Do I need to use a tool? No\nFinal Answer: Great choice! When would you like to travel?"),
+]
+
+
+def load_fake_script() -> list:
+    script = []
+    if LLM_FAKE_SCRIPT:
+        with open(LLM_FAKE_SCRIPT, encoding="utf-8") as f:
+            script = [(rule["match"], rule["response"]) for rule in json.load(f)]
+    return script + DEFAULT_FAKE_SCRIPT
+
+
+def cassette_path(key: str) -> str:
+    return os.path.join(LLM_CASSETTE_DIR, f"{key}.json")
+
+
+def save_exchange(llm, messages, stop, text: str, elapsed: float):
+    key = exchange_key(llm.model_name, llm.temperature, llm.max_tokens, messages, stop)
+    os.makedirs(LLM_CASSETTE_DIR, exist_ok=True)
+    tmp_path = cassette_path(key) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "key": key,
+            "model": llm.model_name,
+            "messages": _serialize_messages(messages),
+            "stop": stop or [],
+            "response": text,
+            "elapsed_seconds": round(elapsed, 3),
+            "recorded_at": datetime.utcnow().isoformat(),
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cassette_path(key))
+
+
+def make_chat_model(lane: str, model: str, temperature: float, max_tokens: int):
+    """
+    Chat model for a chain, picked by LLM_BACKEND. Every backend goes
+    through the governor in `lane`, so offline runs see the same queueing.
+    The model classes (and langchain/openai with them) are imported here,
+    on first use, not when the app starts.
+    """
+    from chains.llm_models import GovernedChatTogether, RecordingChatTogether, FakeChatModel, ReplayChatModel
+
+    if LLM_BACKEND == "together":
+        return GovernedChatTogether(lane=lane, model=model, temperature=temperature, max_tokens=max_tokens)
+    if LLM_BACKEND == "record":
+        return RecordingChatTogether(lane=lane, model=model, temperature=temperature, max_tokens=max_tokens)
+    if LLM_BACKEND == "fake":
+        return FakeChatModel(lane=lane, model_name=model, temperature=temperature, max_tokens=max_tokens, script=load_fake_script())
+    if LLM_BACKEND == "replay":
+        return ReplayChatModel(lane=lane, model_name=model, temperature=temperature, max_tokens=max_tokens)
+    raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}, expected one of: {', '.join(BACKENDS)}")
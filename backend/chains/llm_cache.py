@@ -0,0 +1,62 @@
+import os
+import re
+import json
+import hashlib
+from datetime import datetime, timedelta
+from core.database import llm_cache_col
+from chains.llm_backend import is_offline_backend
+
+LLM_CACHE_TTL_DAYS = int(os.getenv("LLM_CACHE_TTL_DAYS", "7"))
+
+_indexes_ready = False
+
+
+def llm_cache_key(llm, prompt: str) -> str:
+    """
+    Hash of the model parameters and the whitespace-normalized prompt.
+    """
+    key_source = {
+        "model": getattr(llm, "model_name", None),
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
+        "prompt": re.sub(r"\s+", " ", prompt).strip(),
+    }
+    return hashlib.sha256(json.dumps(key_source, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+async def get_cached_completion(llm, prompt: str):
+    # Fake and replayed answers must never end up in (or come from) the real cache
+    if is_offline_backend():
+        return None
+    try:
+        doc = await llm_cache_col.find_one({"_id": llm_cache_key(llm, prompt)})
+    except Exception as e:
+        print(f"⚠️ LLM cache read failed: {e}")
+        return None
+    if not doc or doc["expires_at"] <= datetime.utcnow():
+        return None
+    print(f"⚡ LLM cache hit ({doc['_id'][:12]})")
+    return doc["response_text"]
+
+
+async def store_completion(llm, prompt: str, response_text: str):
+    global _indexes_ready
+    if is_offline_backend():
+        return
+    try:
+        if not _indexes_ready:
+            await llm_cache_col.create_index("expires_at", expireAfterSeconds=0)
+            _indexes_ready = True
+        now = datetime.utcnow()
+        await llm_cache_col.replace_one(
+            {"_id": llm_cache_key(llm, prompt)},
+            {
+                "model": getattr(llm, "model_name", None),
+                "response_text": response_text,
+                "created_at": now,
+                "expires_at": now + timedelta(days=LLM_CACHE_TTL_DAYS),
+            },
+            upsert=True
+        )
+    except Exception as e:
+        print(f"⚠️ LLM cache write failed: {e}")
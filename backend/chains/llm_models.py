@@ -0,0 +1,154 @@
+import re
+import json
+import time
+import asyncio
+from typing import Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_together import ChatTogether
+from chains.governor import GovernedChatModel
+from chains.prompt_budget import count_tokens
+from chains.llm_backend import (
+    LLM_FAKE_LATENCY_SECONDS, LLM_FAKE_TOKENS_PER_SECOND, LLM_REPLAY_REALTIME, LLM_CASSETTE_DIR,
+    CassetteMissError, exchange_key, cut_at_stop, split_for_stream, load_fake_script, cassette_path, save_exchange
+)
+
+
+def _chat_result(text: str, prompt_tokens: int) -> ChatResult:
+    completion_tokens = count_tokens(text)
+    return ChatResult(
+        generations=[ChatGeneration(message=AIMessage(content=text))],
+        llm_output={"token_usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }}
+    )
+
+
+class GovernedChatTogether(GovernedChatModel, ChatTogether):
+    lane: str = "background"
+
+
+class RecordingChatTogether(GovernedChatTogether):
+    """
+    GovernedChatTogether that writes every finished exchange to LLM_CASSETTE_DIR.
+    """
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.monotonic()
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        save_exchange(self, messages, stop, result.generations[0].message.content, time.monotonic() - started)
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.monotonic()
+        parts = []
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            parts.append(chunk.message.content)
+            yield chunk
+        save_exchange(self, messages, stop, "".join(parts), time.monotonic() - started)
+
+
+class _ScriptedChatModel(BaseChatModel):
+    """
+    Offline chat model that answers from a script of (regex, response) rules,
+    with a fixed time to first token and a fixed token throughput.
+    """
+    model_name: str = "fake"
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    latency_seconds: float = LLM_FAKE_LATENCY_SECONDS
+    tokens_per_second: float = LLM_FAKE_TOKENS_PER_SECOND
+    script: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages, stop) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        for pattern, response in self.script or load_fake_script():
+            if re.search(pattern, prompt):
+                return cut_at_stop(response, stop)
+        return "OK"
+
+    def _delay(self, text: str) -> float:
+        if self.tokens_per_second <= 0:
+            return self.latency_seconds
+        return self.latency_seconds + count_tokens(text) / self.tokens_per_second
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._respond(messages, stop)
+        time.sleep(self._delay(text))
+        return _chat_result(text, self._estimate_prompt_tokens(messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._respond(messages, stop)
+        await asyncio.sleep(self._delay(text))
+        return _chat_result(text, self._estimate_prompt_tokens(messages))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._respond(messages, stop)
+        await asyncio.sleep(self.latency_seconds)
+        for piece in split_for_stream(text):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(count_tokens(piece) / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    def _estimate_prompt_tokens(self, messages) -> int:
+        return sum(count_tokens(str(message.content)) for message in messages)
+
+
+class FakeChatModel(GovernedChatModel, _ScriptedChatModel):
+    lane: str = "background"
+
+
+class _CassetteChatModel(BaseChatModel):
+    """
+    Offline chat model that answers with exchanges recorded by RecordingChatTogether.
+    """
+    model_name: str
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat"
+
+    def _load(self, messages, stop):
+        key = exchange_key(self.model_name, self.temperature, self.max_tokens, messages, stop)
+        try:
+            with open(cassette_path(key), encoding="utf-8") as f:
+                exchange = json.load(f)
+        except FileNotFoundError:
+            raise CassetteMissError(f"No recorded exchange {key[:12]} in {LLM_CASSETTE_DIR} - record it with LLM_BACKEND=record")
+        return exchange["response"], exchange.get("elapsed_seconds", 0) if LLM_REPLAY_REALTIME else 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, delay = self._load(messages, stop)
+        time.sleep(delay)
+        return _chat_result(text, sum(count_tokens(str(message.content)) for message in messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, delay = self._load(messages, stop)
+        await asyncio.sleep(delay)
+        return _chat_result(text, sum(count_tokens(str(message.content)) for message in messages))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        text, delay = self._load(messages, stop)
+        pieces = split_for_stream(text)
+        for piece in pieces:
+            await asyncio.sleep(delay / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+class ReplayChatModel(GovernedChatModel, _CassetteChatModel):
+    lane: str = "background"
@@ -1,19 +1,90 @@
-from langchain_together import ChatTogether
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+import json
+from functools import lru_cache
+from chains.llm_backend import make_chat_model
 from travelplan.traveljson import get_empty_plan2
-
-plan_generator_llm = ChatTogether(
-    model="deepseek-ai/DeepSeek-V3",
-    temperature=0.7,
-    max_tokens=4096
-)
+from travelplan.json_repair import parse_llm_json
 
 json2_skeleton = get_empty_plan2()
 
-plan_generator_llm_prompt = PromptTemplate(
-    input_variables=["travel_information", "json2_skeleton"],
-    template="""[...]"""
-)
 
-plan_generator_chain = LLMChain(llm=plan_generator_llm, prompt=plan_generator_llm_prompt)
+@lru_cache(maxsize=None)
+def get_plan_generator_llm():
+    return make_chat_model(
+        lane="plan",
+        model="deepseek-ai/DeepSeek-V3",
+        temperature=0.7,
+        max_tokens=4096
+    )
+
+
+# Two-phase generation for long trips: a short outline first, then every day on its own
+@lru_cache(maxsize=None)
+def get_plan_outline_llm():
+    return make_chat_model(
+        lane="plan",
+        model="deepseek-ai/DeepSeek-V3",
+        temperature=0.7,
+        max_tokens=2048
+    )
+
+
+# str.format templates (doubled braces are literal)
+day_skeleton = json.dumps(parse_llm_json(json2_skeleton)["daily_plan"][0], indent=2)
+
+plan_outline_template = """
+Plan the outline of a trip based on the data from TRAVEL INFORMATION.
+Decide which city the traveler is in on every day of the trip and give each day a short theme.
+If any data is missing – make your own sensible suggestions.
+
+🔴 VERY IMPORTANT:
+- RETURN ONLY A VALID AND CLEAN JSON – NO COMMENTS, NO TEXT BEFORE OR AFTER.
+- Include EVERY day of the trip in "days", in order. Keep themes under 10 words.
+- Dates are in YYYY-MM-DD format.
+
+TRAVEL INFORMATION:
+{travel_information}
+
+INFORMATION FROM USER:
+{user_about_info}
+
+JSON:
+{{
+  "trip_name": null,
+  "start_date": null,
+  "end_date": null,
+  "duration_days": null,
+  "destination_country": null,
+  "destination_cities": [],
+  "days": [
+    {{"day": 1, "date": null, "city": null, "theme": null}}
+  ],
+  "general_notes": [],
+  "emergency_contacts": [
+    {{"name": null, "phone": null, "type": null}}
+  ]
+}}
+"""
+
+plan_day_template = """
+Write the detailed plan of ONE day of a trip. The whole trip is described in TRIP OUTLINE –
+do not repeat attractions that clearly belong to other days.
+
+DAY TO PLAN: day {day}, {date}, {city} – {theme}
+
+🔴 VERY IMPORTANT:
+- RETURN ONLY A VALID AND CLEAN JSON OBJECT FOR THIS ONE DAY – NO COMMENTS, NO TEXT BEFORE OR AFTER.
+- Use real place names in "location_name" so they can be found on Google Maps.
+- NEWLINE characters inside strings should be written as \\n (double backslash).
+
+TRAVEL INFORMATION:
+{travel_information}
+
+INFORMATION FROM USER:
+{user_about_info}
+
+TRIP OUTLINE:
+{trip_outline}
+
+JSON:
+{day_skeleton}
+"""
@@ -0,0 +1,144 @@
+import os
+import json
+from functools import lru_cache
+
+# Budżety tokenów dla poszczególnych sekcji promptu czatu
+TRIP_INFORMATION_TOKEN_BUDGET = int(os.getenv("TRIP_INFORMATION_TOKEN_BUDGET", "800"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1200"))
+TOOLS_TOKEN_BUDGET = int(os.getenv("TOOLS_TOKEN_BUDGET", "900"))
+
+# Mongo metadata that means nothing to the model (top-level keys only)
+TRIP_INFORMATION_SKIP_KEYS = {"_id", "trip_id", "updated_at", "checklist", "version"}
+
+
+@lru_cache(maxsize=None)
+def get_token_encoding():
+    # Ładowane przy pierwszym liczeniu - na zimnej maszynie tiktoken pobiera plik BPE z sieci
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Bez tiktoken liczymy przybliżenie: ~4 znaki na token
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = get_token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    encoding = get_token_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:budget]) + "…"
+    return text[:budget * 4] + "…"
+
+
+def _prune(value):
+    """
+    Drop nulls, empty strings/lists/dicts and skeleton entries whose fields
+    are all empty. Returns None when nothing is left.
+    """
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            item = _prune(item)
+            if item is not None:
+                pruned[key] = item
+        return pruned or None
+    if isinstance(value, list):
+        pruned = [item for item in (_prune(item) for item in value) if item is not None]
+        return pruned or None
+    if value is None or value == "":
+        return None
+    return value
+
+
+def compact_trip_information(trip_information_doc: dict, budget: int = TRIP_INFORMATION_TOKEN_BUDGET) -> str:
+    if not trip_information_doc:
+        return "{}"
+    data = trip_information_doc.get("data", trip_information_doc)
+    # Nested fields may share a name with the metadata (e.g. a place's "version") - keep those
+    data = {key: value for key, value in data.items() if key not in TRIP_INFORMATION_SKIP_KEYS}
+    compact = _prune(data) or {}
+    text = json.dumps(compact, ensure_ascii=False, separators=(",", ":"), default=str)
+    return truncate_to_tokens(text, budget)
+
+
+def fit_history(summary: str, messages: list, budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> str:
+    """
+    The summary first (it condenses everything older), then as many of the
+    newest messages as fit in the budget.
+    """
+    parts = []
+    remaining = budget
+    if summary:
+        summary_text = truncate_to_tokens(f"Summary of the earlier conversation: {summary}", budget // 3)
+        parts.append(summary_text)
+        remaining -= count_tokens(summary_text)
+
+    kept = []
+    for message in reversed(messages):
+        cost = count_tokens(message) + 1
+        if cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+    parts.extend(reversed(kept))
+    return "\n".join(parts)
+
+
+def render_tools_within_budget(tools, budget: int = TOOLS_TOKEN_BUDGET) -> str:
+    """
+    tools_renderer for create_react_agent. Short descriptions are kept whole;
+    the budget they leave over is shared by the long ones, which are cut at a
+    line boundary.
+    """
+    descriptions = {
+        tool.name: "\n".join(line.strip() for line in tool.description.splitlines() if line.strip())
+        for tool in tools
+    }
+
+    shares = {}
+    remaining = budget
+    pending = sorted(descriptions, key=lambda name: count_tokens(descriptions[name]))
+    while pending:
+        share = remaining // len(pending)
+        name = pending.pop(0)
+        cost = count_tokens(descriptions[name])
+        shares[name] = min(cost, share)
+        remaining -= shares[name]
+
+    rendered = []
+    for tool in tools:
+        description = descriptions[tool.name]
+        if count_tokens(description) > shares[tool.name]:
+            kept_lines = []
+            for line in description.splitlines():
+                if count_tokens("\n".join(kept_lines + [line])) > shares[tool.name]:
+                    break
+                kept_lines.append(line)
+            description = "\n".join(kept_lines) or truncate_to_tokens(description, shares[tool.name])
+        rendered.append(f"{tool.name}: {description}")
+    return "\n".join(rendered)
+
+
+def assemble_chat_inputs(user_message: str, trip_information_doc: dict, summary: str, messages: list) -> dict:
+    inputs = {
+        "input": user_message,
+        "chat_history": fit_history(summary, messages),
+        "trip_gathered_information": compact_trip_information(trip_information_doc),
+    }
+    print(
+        "🧮 Prompt tokens - "
+        f"trip info: {count_tokens(inputs['trip_gathered_information'])}, "
+        f"history: {count_tokens(inputs['chat_history'])}, "
+        f"input: {count_tokens(user_message)}"
+    )
+    return inputs
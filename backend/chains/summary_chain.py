@@ -0,0 +1,35 @@
+from functools import lru_cache
+from chains.llm_backend import make_chat_model
+
+summary_llm_template = """
+You maintain a running summary of a conversation between a user and a travel assistant.
+
+Extend the current summary with the new messages. Keep facts the user gave
+(destinations, dates, travelers, budget, preferences, decisions) and drop small talk.
+Write at most 120 words. Output only the summary.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:
+"""
+
+
+@lru_cache(maxsize=None)
+def get_summary_chain():
+    from langchain.chains import LLMChain
+    from langchain_core.prompts import PromptTemplate
+
+    summary_llm = make_chat_model(
+        lane="background",
+        model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free",
+        temperature=0.2,
+        max_tokens=256
+    )
+    return LLMChain(llm=summary_llm, prompt=PromptTemplate(
+        input_variables=["summary", "messages"],
+        template=summary_llm_template
+    ))
@@ -1,13 +1,135 @@
-import requests
+import httpx
 import json
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-from datetime import date, timedelta
-from langchain.tools import Tool
+from datetime import date, datetime, timedelta
+from langchain_core.tools import Tool
+from core.http import http_get
 
 load_dotenv()
 
-def search_flights(input_data: str) -> str:
+# Kiwi bywa wolne - dłuższy limit niż domyślny, ale nigdy bez limitu
+KIWI_TIMEOUT_SECONDS = float(os.getenv("KIWI_TIMEOUT_SECONDS", "20"))
+
+# Okno wylotu dzielimy na stałe (wyrównane do epoki) przedziały, żeby nakładające się
+# wyszukiwania trafiały w te same wpisy cache
+FLIGHT_SUBRANGE_DAYS = int(os.getenv("FLIGHT_SUBRANGE_DAYS", "7"))
+FLIGHT_MAX_SUBRANGES = int(os.getenv("FLIGHT_MAX_SUBRANGES", "6"))
+# Najdłuższe okno, które zawsze mieści się w FLIGHT_MAX_SUBRANGES wyrównanych przedziałach
+FLIGHT_MAX_WINDOW_DAYS = FLIGHT_SUBRANGE_DAYS * (FLIGHT_MAX_SUBRANGES - 1) + 1
+FLIGHT_SUBRANGE_RESULTS = int(os.getenv("FLIGHT_SUBRANGE_RESULTS", "5"))
+FLIGHT_CACHE_TTL_SECONDS = int(os.getenv("FLIGHT_CACHE_TTL_SECONDS", "600"))
+
+# query key -> (fetched_at, normalized itineraries)
+_flight_cache = {}
+_flight_in_flight = {}
+
+
+def split_date_window(start: date, end: date, days: int = FLIGHT_SUBRANGE_DAYS) -> list:
+    """
+    Cover [start, end] with fixed, epoch-aligned sub-ranges of `days` days.
+    """
+    epoch = date(1970, 1, 1)
+    chunk_start = epoch + timedelta(days=((start - epoch).days // days) * days)
+    ranges = []
+    while chunk_start <= end:
+        ranges.append((chunk_start, chunk_start + timedelta(days=days - 1)))
+        chunk_start += timedelta(days=days)
+    return ranges
+
+
+def _simplify_itinerary(itinerary: dict, currency: str, is_round_trip: bool):
+    amount = itinerary.get('priceEur', {}).get('amount')
+    result = {
+        "price": f"{amount} {currency}",
+        "provider": itinerary.get("provider", {}).get("name"),
+        "booking_link": f"https://www.kiwi.com{itinerary['bookingOptions']['edges'][0]['node']['bookingUrl']}",
+    }
+    outbound_segment = itinerary.get("outbound", {}).get("sectorSegments", [{}])[0].get("segment", {})
+    result["outbound_flight"] = {
+        "airline": outbound_segment.get("carrier", {}).get("name"),
+        "departure_from": outbound_segment.get("source", {}).get("station", {}).get("name"),
+        "departure_time": outbound_segment.get("source", {}).get("localTime"),
+        "arrival_to": outbound_segment.get("destination", {}).get("station", {}).get("name"),
+        "arrival_time": outbound_segment.get("destination", {}).get("localTime"),
+    }
+    if is_round_trip and "inbound" in itinerary:
+        inbound_segment = itinerary.get("inbound", {}).get("sectorSegments", [{}])[0].get("segment", {})
+        result["inbound_flight"] = {
+            "airline": inbound_segment.get("carrier", {}).get("name"),
+            "departure_from": inbound_segment.get("source", {}).get("station", {}).get("name"),
+            "departure_time": inbound_segment.get("source", {}).get("localTime"),
+            "arrival_to": inbound_segment.get("destination", {}).get("station", {}).get("name"),
+            "arrival_time": inbound_segment.get("destination", {}).get("localTime"),
+        }
+    try:
+        price_value = float(amount)
+    except (TypeError, ValueError):
+        price_value = float("inf")
+    return price_value, result
+
+
+async def _fetch_subrange(url: str, headers: dict, querystring: dict, currency: str, is_round_trip: bool) -> list:
+    response = await http_get(url, headers=headers, params=querystring, timeout=KIWI_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    data = response.json()
+
+    itineraries = []
+    for itinerary in data.get("itineraries", []):
+        try:
+            itineraries.append(_simplify_itinerary(itinerary, currency, is_round_trip))
+        except (KeyError, IndexError):
+            continue
+    return itineraries
+
+
+async def _search_subrange(url: str, headers: dict, querystring: dict, currency: str, is_round_trip: bool) -> list:
+    key = url + "?" + json.dumps(querystring, sort_keys=True)
+    cached = _flight_cache.get(key)
+    if cached and time.monotonic() - cached[0] < FLIGHT_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    # Identical sub-range already being fetched in this conversation turn
+    task = _flight_in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_subrange(url, headers, querystring, currency, is_round_trip))
+        _flight_in_flight[key] = task
+        task.add_done_callback(lambda _: _flight_in_flight.pop(key, None))
+    itineraries = await task
+
+    now = time.monotonic()
+    for stale_key in [k for k, (fetched_at, _) in _flight_cache.items() if now - fetched_at >= FLIGHT_CACHE_TTL_SECONDS]:
+        _flight_cache.pop(stale_key, None)
+    _flight_cache[key] = (now, itineraries)
+    return itineraries
+
+
+def _rank_itineraries(itineraries: list, sort_by: str, sort_order: str) -> list:
+    """
+    Merge the (rank within its sub-range, price, result) entries of all
+    sub-ranges. PRICE and DATE are sorted here; any other sort (QUALITY) has
+    no value to compare, so the provider's order within each sub-range is
+    kept and the sub-ranges are interleaved rank by rank, earliest first.
+    """
+    unique = {}
+    for rank, price_value, result in itineraries:
+        unique.setdefault(result["booking_link"], (rank, price_value, result))
+
+    ranked = list(unique.values())
+    descending = sort_order == "DESCENDING"
+    if sort_by == "PRICE":
+        ranked.sort(key=lambda item: item[1], reverse=descending)
+    elif sort_by == "DATE":
+        ranked.sort(key=lambda item: item[2]["outbound_flight"].get("departure_time") or "", reverse=descending)
+    else:
+        # Stable sort: equal ranks stay in sub-range (date) order
+        ranked.sort(key=lambda item: item[0])
+    return [result for _, _, result in ranked]
+
+
+async def search_flights(input_data: str) -> str:
     try:
         user_input = json.loads(input_data)
     except json.JSONDecodeError:
@@ -46,6 +168,11 @@ def search_flights(input_data: str) -> str:
 
     params = {**defaults, **user_input}
 
+    try:
+        result_limit = int(params["limit"])
+    except (TypeError, ValueError):
+        return json.dumps({"error": "'limit' must be a number."})
+
     is_round_trip = params.get("inbound_start_date") is not None
     api_endpoint = "round-trip" if is_round_trip else "one-way"
     url = f"https://kiwi-com-cheap-flights.p.rapidapi.com/{api_endpoint}"
@@ -53,8 +180,6 @@ def search_flights(input_data: str) -> str:
     querystring = {
         "source": f"{params['source_type']}:{params['source']}",
         "destination": f"{params['destination_type']}:{params['destination']}",
-        "outboundDepartmentDateStart": f"{params['departure_start_date']}T00:00:00",
-        "outboundDepartmentDateEnd": f"{params['departure_end_date']}T23:59:59",
         "currency": params["currency"],
         "locale": params["locale"],
         "adults": str(params["adults"]),
@@ -65,7 +190,7 @@ def search_flights(input_data: str) -> str:
         "cabinClass": params["cabinClass"].upper(),
         "sortBy": params["sortBy"].upper(),
         "sortOrder": params["sortOrder"].upper(),
-        "limit": str(params["limit"]),
+        "limit": str(max(result_limit, FLIGHT_SUBRANGE_RESULTS)),
         "applyMixedClasses": str(params["applyMixedClasses"]).lower(),
         "allowReturnFromDifferentCity": str(params["allowReturnFromDifferentCity"]).lower(),
         "allowChangeInboundDestination": str(params["allowChangeInboundDestination"]).lower(),
@@ -81,59 +206,71 @@ def search_flights(input_data: str) -> str:
         "x-rapidapi-key": api_key,
         "x-rapidapi-host": "kiwi-com-cheap-flights.p.rapidapi.com"
     }
-    print(querystring)
 
     try:
-        response = requests.get(url, headers=headers, params=querystring)
-        response.raise_for_status()
-        data = response.json()
-
-        if not data.get("itineraries"):
-            return json.dumps({"message": f"No flights found from {params['source']} to {params['destination']} for the given criteria."})
-
-        simplified_results = []
-        for itinerary in data.get("itineraries", []):
-            try:
-                result = {
-                    "price": f"{itinerary.get('priceEur', {}).get('amount')} {params['currency']}",
-                    "provider": itinerary.get("provider", {}).get("name"),
-                    "booking_link": f"https://www.kiwi.com{itinerary['bookingOptions']['edges'][0]['node']['bookingUrl']}",
-                }
-                outbound_segment = itinerary.get("outbound", {}).get("sectorSegments", [{}])[0].get("segment", {})
-                result["outbound_flight"] = {
-                    "airline": outbound_segment.get("carrier", {}).get("name"),
-                    "departure_from": outbound_segment.get("source", {}).get("station", {}).get("name"),
-                    "departure_time": outbound_segment.get("source", {}).get("localTime"),
-                    "arrival_to": outbound_segment.get("destination", {}).get("station", {}).get("name"),
-                    "arrival_time": outbound_segment.get("destination", {}).get("localTime"),
-                }
-                if is_round_trip and "inbound" in itinerary:
-                    inbound_segment = itinerary.get("inbound", {}).get("sectorSegments", [{}])[0].get("segment", {})
-                    result["inbound_flight"] = {
-                        "airline": inbound_segment.get("carrier", {}).get("name"),
-                        "departure_from": inbound_segment.get("source", {}).get("station", {}).get("name"),
-                        "departure_time": inbound_segment.get("source", {}).get("localTime"),
-                        "arrival_to": inbound_segment.get("destination", {}).get("station", {}).get("name"),
-                        "arrival_time": inbound_segment.get("destination", {}).get("localTime"),
-                    }
-                simplified_results.append(result)
-            except (KeyError, IndexError):
-                continue
-        
-        if not simplified_results:
-             return json.dumps({"message": f"Could not process flight data for {params['destination']}."})
-
-        return json.dumps(simplified_results, ensure_ascii=False, indent=2)
-
-    except requests.exceptions.HTTPError as http_err:
-        return json.dumps({"error": f"An HTTP error occurred while searching for flights: {http_err}"})
-    except Exception as e:
-        return json.dumps({"error": f"An unexpected error occurred while searching for flights: {e}"})
+        window_start = datetime.strptime(params["departure_start_date"], "%Y-%m-%d").date()
+        window_end = datetime.strptime(params["departure_end_date"], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return json.dumps({"error": "Dates must be in 'YYYY-MM-DD' format."})
+    if window_end < window_start:
+        return json.dumps({"error": "'departure_end_date' must not be earlier than 'departure_start_date'."})
+    today = date.today()
+    if window_end < today:
+        return json.dumps({"error": "The departure window is in the past."})
+    window_start = max(window_start, today)
+
+    subranges = split_date_window(window_start, window_end)
+    if len(subranges) > FLIGHT_MAX_SUBRANGES:
+        # Better to refuse than to return a partial search as if it were complete
+        return json.dumps({"error": f"The departure window is too long. Search at most {FLIGHT_MAX_WINDOW_DAYS} days at a time."})
+    # The first aligned sub-range may begin before the window - never ask for past dates
+    subranges[0] = (max(subranges[0][0], today), subranges[0][1])
+    subrange_queries = []
+    for subrange_start, subrange_end in subranges:
+        subrange_querystring = {
+            **querystring,
+            "outboundDepartmentDateStart": f"{subrange_start.isoformat()}T00:00:00",
+            "outboundDepartmentDateEnd": f"{subrange_end.isoformat()}T23:59:59",
+        }
+        subrange_queries.append(subrange_querystring)
+    print(f"✈️ Searching {len(subrange_queries)} date sub-ranges: {querystring['source']} -> {querystring['destination']}")
+
+    results = await asyncio.gather(
+        *(_search_subrange(url, headers, subrange_querystring, params["currency"], is_round_trip) for subrange_querystring in subrange_queries),
+        return_exceptions=True
+    )
+
+    itineraries = []
+    errors = []
+    for result in results:
+        if isinstance(result, Exception):
+            errors.append(result)
+        else:
+            itineraries.extend((rank, price_value, itinerary) for rank, (price_value, itinerary) in enumerate(result))
+
+    if errors and len(errors) == len(results):
+        http_err = errors[0]
+        if isinstance(http_err, httpx.HTTPStatusError):
+            return json.dumps({"error": f"An HTTP error occurred while searching for flights: {http_err}"})
+        return json.dumps({"error": f"An unexpected error occurred while searching for flights: {http_err}"})
+
+    # Aligned sub-ranges can reach outside the requested window
+    itineraries = [
+        (rank, price_value, result) for rank, price_value, result in itineraries
+        if not result["outbound_flight"].get("departure_time")
+        or window_start.isoformat() <= result["outbound_flight"]["departure_time"][:10] <= params["departure_end_date"]
+    ]
+
+    if not itineraries:
+        return json.dumps({"message": f"No flights found from {params['source']} to {params['destination']} for the given criteria."})
+
+    ranked = _rank_itineraries(itineraries, querystring["sortBy"], querystring["sortOrder"])
+    return json.dumps(ranked[:result_limit], ensure_ascii=False)
 
 
 flight_searcher_tool = Tool(
     name="flight_searcher",
-    description="""Use this tool to search for one-way or round-trip flights.
+    description=f"""Use this tool to search for one-way or round-trip flights.
 The input must be a JSON object containing at least 'source' and 'destination'.
 Locations must be Kiwi location codes (e.g., 'warsaw_pl', 'krakow_pl', 'london_gb').
 
@@ -154,6 +291,9 @@ Available parameters:
 - 'cabinClass': Travel class. Can be 'ECONOMY', 'PREMIUM_ECONOMY', 'BUSINESS', 'FIRST'. Defaults to 'ECONOMY'.
 - 'limit': Maximum number of results to return. Defaults to 1.
 
+To find the cheapest flight in a period (e.g. "next month"), pass the whole period (up to {FLIGHT_MAX_WINDOW_DAYS} days) as one departure window - it is searched in parallel, so do not call the tool once per day. Departure dates before today are skipped.
+
 The tool returns a JSON list of available flight options, including price, provider, flight times, and a booking link.""",
-    func=search_flights
+    func=None,
+    coroutine=search_flights
 )
@@ -1,25 +1,34 @@
-import requests
+import httpx
 import json
 import os
+import asyncio
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from langchain.tools import Tool
+from pymongo import ReturnDocument
+from langchain_core.tools import Tool
+from core.http import http_get
+from core.database import hotels_cache_col
+from core.geocode_cache import normalize_place_key
 
 # Ładujemy zmienne środowiskowe z pliku .env
 load_dotenv()
 
-def Google_Hotels(input_data: str) -> str:
-    try:
-        data = json.loads(input_data)
-        city = data.get("city")
-        if not city:
-            return json.dumps({"error": "Klucz 'city' jest wymagany w JSON na wejściu."})
-    except json.JSONDecodeError:
-        return json.dumps({"error": "Niepoprawny format JSON na wejściu. Oczekiwano np. '{\"city\": \"Paris\"}'."})
+# Po HOTEL_CACHE_FRESH_HOURS wpis jest "stary" - nadal go zwracamy, ale odświeżamy w tle.
+# Po HOTEL_CACHE_MAX_STALE_HOURS Mongo usuwa go z kolekcji (indeks TTL).
+HOTEL_CACHE_FRESH_HOURS = int(os.getenv("HOTEL_CACHE_FRESH_HOURS", "24"))
+HOTEL_CACHE_MAX_STALE_HOURS = int(os.getenv("HOTEL_CACHE_MAX_STALE_HOURS", str(7 * 24)))
+# Popularne miasta odświeżamy zanim wpis się zestarzeje
+HOTEL_REFRESH_AHEAD_HOURS = int(os.getenv("HOTEL_REFRESH_AHEAD_HOURS", "2"))
+HOTEL_HOT_HITS = int(os.getenv("HOTEL_HOT_HITS", "5"))
 
-    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
-    if not api_key:
-        return json.dumps({"error": "Klucz GOOGLE_API_KEY nie jest ustawiony w pliku .env."})
+_indexes_ready = False
+_refreshing = {}
 
+
+async def _fetch_hotels(city: str, language: str, api_key: str):
+    """
+    Query Google Places for hotels in a city. Returns (tool output, cacheable).
+    """
     # Adres URL do Google Places API - Text Search
     url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
 
@@ -27,19 +36,19 @@ def Google_Hotels(input_data: str) -> str:
     params = {
         "query": f"hotele w {city}",
         "key": api_key,
-        "language": "pl" # Możesz zmienić na 'en' jeśli wolisz wyniki po angielsku
+        "language": language
     }
 
     try:
-        response = requests.get(url, params=params)
+        response = await http_get(url, params=params)
         response.raise_for_status()  # Sprawdza czy nie ma błędów HTTP (np. 4xx, 5xx)
         results_data = response.json()
 
         # Sprawdzanie statusu odpowiedzi z API Google
         if results_data["status"] != "OK":
             if results_data["status"] == "ZERO_RESULTS":
-                 return json.dumps({"message": f"Nie znaleziono hoteli w mieście: {city}."})
-            return json.dumps({"error": f"Błąd API Google: {results_data.get('status')}", "details": results_data.get('error_message', '')})
+                 return json.dumps({"message": f"Nie znaleziono hoteli w mieście: {city}."}), True
+            return json.dumps({"error": f"Błąd API Google: {results_data.get('status')}", "details": results_data.get('error_message', '')}), False
 
         # Przetwarzanie odpowiedzi, aby była czytelniejsza dla LLM
         simplified_results = []
@@ -53,18 +62,96 @@ def Google_Hotels(input_data: str) -> str:
             })
 
         if not simplified_results:
-            return json.dumps({"message": f"Nie znaleziono hoteli w mieście: {city}."})
+            return json.dumps({"message": f"Nie znaleziono hoteli w mieście: {city}."}), True
 
-        return json.dumps(simplified_results, ensure_ascii=False, indent=2)
+        return json.dumps(simplified_results, ensure_ascii=False, indent=2), True
 
-    except requests.exceptions.RequestException as e:
-        return json.dumps({"error": f"Wystąpił błąd połączenia z API: {e}"})
+    except httpx.HTTPError as e:
+        return json.dumps({"error": f"Wystąpił błąd połączenia z API: {e}"}), False
     except Exception as e:
-        return json.dumps({"error": f"Wystąpił nieoczekiwany błąd: {e}"})
+        return json.dumps({"error": f"Wystąpił nieoczekiwany błąd: {e}"}), False
+
+
+async def _fetch_and_store(key: str, city: str, language: str, api_key: str) -> str:
+    global _indexes_ready
+    output, cacheable = await _fetch_hotels(city, language, api_key)
+    if not cacheable:
+        return output
+
+    try:
+        if not _indexes_ready:
+            await hotels_cache_col.create_index("expires_at", expireAfterSeconds=0)
+            _indexes_ready = True
+        now = datetime.utcnow()
+        # Pipeline update, so the refresh can decay the hit count instead of zeroing it:
+        # a city that stays popular stays hot, one that cooled down drops below HOTEL_HOT_HITS
+        await hotels_cache_col.update_one(
+            {"_id": key},
+            [{"$set": {
+                "city": city,
+                "language": language,
+                "output": output,
+                "hits": {"$floor": {"$divide": [{"$ifNull": ["$hits", 0]}, 2]}},
+                "fetched_at": now,
+                "fresh_until": now + timedelta(hours=HOTEL_CACHE_FRESH_HOURS),
+                "expires_at": now + timedelta(hours=HOTEL_CACHE_MAX_STALE_HOURS),
+            }}],
+            upsert=True
+        )
+    except Exception as e:
+        print(f"⚠️ Hotel cache write failed: {e}")
+    return output
+
+
+def _schedule_refresh(key: str, city: str, language: str, api_key: str):
+    if key in _refreshing:
+        return
+    task = asyncio.create_task(_fetch_and_store(key, city, language, api_key))
+    _refreshing[key] = task
+    task.add_done_callback(lambda _: _refreshing.pop(key, None))
+
+
+async def Google_Hotels(input_data: str) -> str:
+    try:
+        data = json.loads(input_data)
+        city = data.get("city")
+        if not city:
+            return json.dumps({"error": "Klucz 'city' jest wymagany w JSON na wejściu."})
+    except json.JSONDecodeError:
+        return json.dumps({"error": "Niepoprawny format JSON na wejściu. Oczekiwano np. '{\"city\": \"Paris\"}'."})
+
+    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        return json.dumps({"error": "Klucz GOOGLE_API_KEY nie jest ustawiony w pliku .env."})
+
+    language = data.get("language", "pl")  # Możesz zmienić na 'en' jeśli wolisz wyniki po angielsku
+    key = normalize_place_key(city, language)
+
+    try:
+        cached = await hotels_cache_col.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"hits": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        print(f"⚠️ Hotel cache read failed: {e}")
+        cached = None
+
+    now = datetime.utcnow()
+    if cached and cached["expires_at"] > now:
+        if cached["fresh_until"] <= now:
+            # Stale-while-revalidate: answer now, refresh in the background
+            _schedule_refresh(key, city, language, api_key)
+        elif cached["hits"] >= HOTEL_HOT_HITS and cached["fresh_until"] - now <= timedelta(hours=HOTEL_REFRESH_AHEAD_HOURS):
+            _schedule_refresh(key, city, language, api_key)
+        return cached["output"]
+
+    return await _fetch_and_store(key, city, language, api_key)
 
 # Definicja narzędzia dla LangChain
 hotel_searcher_tool = Tool(
     name="hotel_searcher",
     description="Użyj tego narzędzia do wyszukiwania hoteli w określonym mieście. Wejście musi być stringiem JSON z kluczem 'city' (np. {'city': 'Paryż'}). Zwraca listę JSON z propozycjami hoteli, zawierającą ich nazwę, adres i ocenę.",
-    func=Google_Hotels,
-)
\ No newline at end of file
+    func=None,
+    coroutine=Google_Hotels,
+)
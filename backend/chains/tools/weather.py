@@ -1,26 +1,90 @@
 
-import requests
+import httpx
 import json
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
 from datetime import datetime, date, timedelta
 from dateutil.parser import parse as parse_date
 
-from langchain_together import ChatTogether
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.tools import Tool, StructuredTool
+from langchain_core.tools import Tool, StructuredTool
 
-from langchain.agents import create_react_agent
+from core.http import http_get
 
 load_dotenv()
 
-def get_current_weather(location: str) -> str:
-    api_key = os.environ.get("OPENWEATHER_API_KEY")
-    if not api_key:
-        return json.dumps({"error": "OpenWeatherMap API key is not set."})
-     
+FORECAST_DAYS = 14
+# WeatherAPI odświeża prognozy mniej więcej co godzinę, bieżące warunki częściej
+WEATHER_FORECAST_TTL_SECONDS = int(os.getenv("WEATHER_FORECAST_TTL_SECONDS", "3600"))
+WEATHER_CURRENT_TTL_SECONDS = int(os.getenv("WEATHER_CURRENT_TTL_SECONDS", "900"))
+WEATHER_CACHE_MAX_LOCATIONS = 500
+
+# normalized location -> (fetched_at, WeatherAPI forecast payload, date fetched on)
+_forecast_cache = {}
+_forecast_locks = {}
+
+
+def _evict_forecasts():
+    """
+    Make room for one more location: drop the expired forecasts and, if all
+    of them are still fresh, the oldest ones.
+    """
+    now = time.monotonic()
+    today = date.today()
+    stale_keys = []
+    fresh = []
+    for k, (fetched_at, _, fetched_on) in _forecast_cache.items():
+        if now - fetched_at >= WEATHER_FORECAST_TTL_SECONDS or fetched_on != today:
+            stale_keys.append(k)
+        else:
+            fresh.append((fetched_at, k))
+
+    overflow = len(fresh) - WEATHER_CACHE_MAX_LOCATIONS + 1
+    if overflow > 0:
+        stale_keys += [k for _, k in sorted(fresh)[:overflow]]
+
+    for stale_key in stale_keys:
+        _forecast_cache.pop(stale_key, None)
+        lock = _forecast_locks.get(stale_key)
+        if lock is not None and not lock.locked():
+            _forecast_locks.pop(stale_key, None)
+
+
+async def get_forecast_range(location: str, max_age: int = WEATHER_FORECAST_TTL_SECONDS) -> dict:
+    """
+    Full 14-day WeatherAPI forecast for a location, fetched once and cached.
+    Concurrent callers for the same location share one request. A forecast
+    fetched before midnight is not reused - it would miss the last day.
+    """
+    key = " ".join(location.casefold().split())
+    cached = _forecast_cache.get(key)
+    if cached and time.monotonic() - cached[0] < max_age and cached[2] == date.today():
+        return cached[1]
+
+    lock = _forecast_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _forecast_cache.get(key)
+        if cached and time.monotonic() - cached[0] < max_age and cached[2] == date.today():
+            return cached[1]
+
+        params = {
+            "key": os.environ.get("WEATHERAPI_API_KEY"),
+            "q": location,
+            "days": FORECAST_DAYS,
+            "lang": "en"
+        }
+        response = await http_get("https://api.weatherapi.com/v1/forecast.json", params=params)
+        response.raise_for_status()
+        data = response.json()
+
+        if key not in _forecast_cache and len(_forecast_cache) >= WEATHER_CACHE_MAX_LOCATIONS:
+            _evict_forecasts()
+        _forecast_cache[key] = (time.monotonic(), data, date.today())
+        return data
+
+
+async def _get_current_weather_openweather(location: str, api_key: str) -> str:
     base_url = "https://api.openweathermap.org/data/2.5/weather"
     params = {
         "q": location,
@@ -30,7 +94,7 @@ def get_current_weather(location: str) -> str:
     }
 
     try:
-        response = requests.get(base_url, params=params)
+        response = await http_get(base_url, params=params)
         response.raise_for_status()
         data = response.json()
         processed_data = {
@@ -43,15 +107,44 @@ def get_current_weather(location: str) -> str:
         }
         return json.dumps(processed_data, ensure_ascii=False)
 
-    except requests.exceptions.HTTPError as http_err:
-        if response.status_code == 404:
+    except httpx.HTTPStatusError as http_err:
+        if http_err.response.status_code == 404:
             return json.dumps({"error": f"City not found: {location}"})
         else:
             return json.dumps({"error": f"An HTTP error occurred: {http_err}"})
     except Exception as e:
         return json.dumps({"error": f"An unexpected error occurred: {e}"})
 
-def get_weather_forecast(json_str: str) -> str:
+
+async def get_current_weather(location: str) -> str:
+    # Served from the cached forecast payload when WeatherAPI is configured
+    if not os.environ.get("WEATHERAPI_API_KEY"):
+        api_key = os.environ.get("OPENWEATHER_API_KEY")
+        if not api_key:
+            return json.dumps({"error": "OpenWeatherMap API key is not set."})
+        return await _get_current_weather_openweather(location, api_key)
+
+    try:
+        data = await get_forecast_range(location, max_age=WEATHER_CURRENT_TTL_SECONDS)
+        current = data["current"]
+        processed_data = {
+            "location": data["location"]["name"],
+            "temperature": f"{current['temp_c']}°C",
+            "feels_like": f"{current['feelslike_c']}°C",
+            "conditions": current["condition"]["text"],
+            "humidity": f"{current['humidity']}%",
+            "wind_speed": f"{round(current['wind_kph'] / 3.6, 2)} m/s"
+        }
+        return json.dumps(processed_data, ensure_ascii=False)
+
+    except httpx.HTTPStatusError as http_err:
+        if http_err.response.status_code == 400:
+            return json.dumps({"error": f"City not found: {location}"})
+        return json.dumps({"error": f"An HTTP error occurred: {http_err}"})
+    except Exception as e:
+        return json.dumps({"error": f"An unexpected error occurred: {e}"})
+
+async def get_weather_forecast(json_str: str) -> str:
     information = json.loads(json_str)
     location = information["location"]
     date_str = information["date"]
@@ -66,27 +159,24 @@ def get_weather_forecast(json_str: str) -> str:
     except (ValueError, TypeError):
         return json.dumps({"error": f"Failed to parse the date: '{date_str}'. Use YYYY-MM-DD format or words like 'tomorrow'."})
 
-    fourteen_days_from_now = today + timedelta(days=14)
+    # A days=FORECAST_DAYS forecast covers today and the FORECAST_DAYS - 1 days after it
+    last_forecast_date = today + timedelta(days=FORECAST_DAYS - 1)
 
     if target_date < today:
         return json.dumps({"error": "Cannot check the weather for a past date."})
-    if target_date > fourteen_days_from_now:
-        return json.dumps({"error": f"The forecast is only available for 14 days ahead. The date '{target_date}' is too far in the future."})
-
-    base_url = "https://api.weatherapi.com/v1/forecast.json"
-    params = {
-        "key": api_key,
-        "q": location,
-        "dt": target_date.strftime('%Y-%m-%d'),
-        "lang": "en"
-    }
+    if target_date > last_forecast_date:
+        return json.dumps({"error": f"The forecast is only available for the next {FORECAST_DAYS} days (until {last_forecast_date}). The date '{target_date}' is too far in the future."})
 
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-         
-        forecast_day_data = data["forecast"]["forecastday"][0]
+        data = await get_forecast_range(location)
+
+        target_str = target_date.strftime('%Y-%m-%d')
+        forecast_day_data = next(
+            (day for day in data["forecast"]["forecastday"] if day["date"] == target_str),
+            None
+        )
+        if forecast_day_data is None:
+            return json.dumps({"error": f"No forecast available for {location} on {target_str}."})
         day_info = forecast_day_data["day"]
          
         wind_kph = day_info['maxwind_kph']
@@ -106,20 +196,20 @@ def get_weather_forecast(json_str: str) -> str:
          
         return json.dumps(processed_data, ensure_ascii=False)
 
-    except requests.exceptions.HTTPError as http_err:
+    except httpx.HTTPStatusError as http_err:
         return json.dumps({"error": f"HTTP error from WeatherAPI.com: {http_err}"})
     except Exception as e:
         return json.dumps({"error": f"An unexpected error occurred: {e}"})
 
-
 current_weather_tool = Tool(
     name="current_weather_checker",
     description="Use this tool to check the CURRENT weather in a given city. Returns a JSON with detailed weather information for now.",
-    func=get_current_weather
+    func=None,
+    coroutine=get_current_weather
 )
 
 forecast_weather_tool = StructuredTool.from_function(
-    func=get_weather_forecast,
+    coroutine=get_weather_forecast,
     name="weather_forecast_checker",
-    description="Use this tool to check the weather FORECAST in a given city for a specific day. The forecast is available up to 14 days in the future. Function has two  different parameters location and date."
+    description="Use this tool to check the weather FORECAST in a given city for a specific day. The forecast is available for today and the next 13 days. Function has two  different parameters location and date."
 )
\ No newline at end of file
@@ -14,3 +14,10 @@ trips_col = db["trips"]
 messages_col = db["messages"]
 plans_col = db["plans"]
 trips_information_col = db["trips-information"]
+geocode_cache_col = db["geocode-cache"]
+photo_prefetch_col = db["photo-prefetch"]
+hotels_cache_col = db["hotels-cache"]
+chat_summaries_col = db["chat-summaries"]
+llm_cache_col = db["llm-cache"]
+plan_jobs_col = db["plan-jobs"]
+plan_drafts_col = db["plan-drafts"]
@@ -0,0 +1,75 @@
+import os
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from core.database import geocode_cache_col
+
+# Jak długo trzymamy znalezione miejsca i "pudła" (brak kandydatów) w cache
+GEOCODE_CACHE_TTL_DAYS = int(os.getenv("GEOCODE_CACHE_TTL_DAYS", "30"))
+GEOCODE_CACHE_NEGATIVE_TTL_HOURS = int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL_HOURS", "24"))
+
+geocode_cache_stats = {"hits": 0, "negative_hits": 0, "misses": 0}
+
+_indexes_ready = False
+
+
+def normalize_place_key(place_name: str, city: str) -> str:
+    def normalize(value: str) -> str:
+        value = unicodedata.normalize("NFKC", value or "").casefold()
+        return re.sub(r"\s+", " ", value).strip(" ,")
+
+    return f"{normalize(place_name)}|{normalize(city)}"
+
+
+async def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    # Mongo usuwa dokumenty samo, gdy minie expires_at
+    await geocode_cache_col.create_index("expires_at", expireAfterSeconds=0)
+    _indexes_ready = True
+
+
+async def get_cached_place(place_name: str, city: str):
+    """
+    Return (hit, result). A hit with result None is a cached miss.
+    """
+    await _ensure_indexes()
+    doc = await geocode_cache_col.find_one({"_id": normalize_place_key(place_name, city)})
+    # TTL monitor runs only once a minute, so check expiry ourselves too
+    if not doc or doc["expires_at"] <= datetime.utcnow():
+        geocode_cache_stats["misses"] += 1
+        return False, None
+
+    if doc.get("result") is None:
+        geocode_cache_stats["negative_hits"] += 1
+    else:
+        geocode_cache_stats["hits"] += 1
+    return True, doc.get("result")
+
+
+async def store_place(place_name: str, city: str, result: dict):
+    await _ensure_indexes()
+    now = datetime.utcnow()
+    if result is None:
+        expires_at = now + timedelta(hours=GEOCODE_CACHE_NEGATIVE_TTL_HOURS)
+    else:
+        expires_at = now + timedelta(days=GEOCODE_CACHE_TTL_DAYS)
+
+    await geocode_cache_col.replace_one(
+        {"_id": normalize_place_key(place_name, city)},
+        {
+            "place_name": place_name,
+            "city": city,
+            "result": result,
+            "created_at": now,
+            "expires_at": expires_at,
+        },
+        upsert=True
+    )
+
+
+def get_geocode_cache_stats() -> dict:
+    lookups = sum(geocode_cache_stats.values())
+    served = geocode_cache_stats["hits"] + geocode_cache_stats["negative_hits"]
+    return {**geocode_cache_stats, "hit_ratio": round(served / lookups, 3) if lookups else 0.0}
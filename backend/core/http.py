@@ -0,0 +1,49 @@
+import os
+import asyncio
+from urllib.parse import urlsplit
+import httpx
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+
+_client = None
+_host_limits = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared pooled client, so upstream TLS connections are reused across requests.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            ),
+            follow_redirects=True
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def http_get(url: str, **kwargs) -> httpx.Response:
+    """
+    GET through the shared client, with at most HTTP_MAX_PER_HOST requests
+    in flight to any single host.
+    """
+    host = urlsplit(url).netloc
+    semaphore = _host_limits.get(host)
+    if semaphore is None:
+        semaphore = _host_limits[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    async with semaphore:
+        return await get_http_client().get(url, **kwargs)
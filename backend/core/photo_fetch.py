@@ -0,0 +1,105 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from core.http import get_http_client
+from core.photo_store import store_photo, get_photo_path
+
+load_dotenv()
+
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+
+
+class PhotoFetch:
+    """
+    One upstream download shared by every request for the same photo.
+    Chunks are kept until the download finishes so late joiners can replay them.
+    """
+
+    def __init__(self):
+        self.status_code = None
+        self.error = None
+        self.done = False
+        self.chunks = []
+        self.task = None
+        self.headers_ready = asyncio.Event()
+        self.changed = asyncio.Condition()
+
+    async def _append(self, chunk: bytes):
+        async with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    async def _finish(self, error: Exception = None):
+        async with self.changed:
+            self.error = error
+            self.done = True
+            self.changed.notify_all()
+        self.headers_ready.set()
+
+    async def stream(self):
+        sent = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: sent < len(self.chunks) or self.done)
+                new_chunks = self.chunks[sent:]
+                finished = self.done
+            for chunk in new_chunks:
+                yield chunk
+            sent += len(new_chunks)
+            if finished and sent >= len(self.chunks):
+                if self.error:
+                    raise self.error
+                return
+
+    async def wait(self) -> bool:
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.done)
+        return self.status_code == 200 and self.error is None
+
+
+_in_flight = {}
+
+
+def _google_photo_url(photoreference: str, maxwidth: int) -> str:
+    return f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={maxwidth}&photoreference={photoreference}&key={GOOGLE_MAPS_API_KEY}"
+
+
+async def _download(fetch: PhotoFetch, photoreference: str, maxwidth: int):
+    error = None
+    try:
+        async with get_http_client().stream("GET", _google_photo_url(photoreference, maxwidth)) as response:
+            fetch.status_code = response.status_code
+            fetch.headers_ready.set()
+            if response.status_code == 200:
+                async for chunk in response.aiter_bytes():
+                    await fetch._append(chunk)
+
+        if fetch.status_code == 200:
+            await asyncio.to_thread(store_photo, photoreference, b"".join(fetch.chunks), maxwidth)
+    except Exception as e:
+        print(f"⚠️ Photo fetch failed for {photoreference[:16]}...: {e}")
+        error = e
+    finally:
+        await fetch._finish(error)
+        # Stored on disk (or failed) - the next request starts from scratch
+        _in_flight.pop((photoreference, maxwidth), None)
+
+
+def start_photo_fetch(photoreference: str, maxwidth: int = 800) -> PhotoFetch:
+    """
+    Return the in-flight fetch for this photo, starting one if needed.
+    The download runs as its own task so a disconnecting client does not
+    cancel it for the others.
+    """
+    fetch = _in_flight.get((photoreference, maxwidth))
+    if fetch is None:
+        fetch = PhotoFetch()
+        _in_flight[(photoreference, maxwidth)] = fetch
+        fetch.task = asyncio.create_task(_download(fetch, photoreference, maxwidth))
+    return fetch
+
+
+async def ensure_photo_cached(photoreference: str, maxwidth: int = 800) -> bool:
+    if await asyncio.to_thread(get_photo_path, photoreference, maxwidth):
+        return True
+    return await start_photo_fetch(photoreference, maxwidth).wait()
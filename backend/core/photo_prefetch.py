@@ -0,0 +1,62 @@
+import os
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from core.database import photo_prefetch_col
+from core.photo_fetch import ensure_photo_cached
+
+PHOTO_PREFETCH_CONCURRENCY = int(os.getenv("PHOTO_PREFETCH_CONCURRENCY", "6"))
+
+
+def collect_photo_references(plan_data: dict) -> list:
+    references = []
+    for day in plan_data.get("daily_plan", []):
+        for activity in day.get("activities", []):
+            reference = activity.get("photo_reference")
+            if reference and reference not in references:
+                references.append(reference)
+    return references
+
+
+async def prefetch_plan_photos(trip_id: str, plan_data: dict, maxwidth: int = 800):
+    """
+    Warm the disk photo cache for every photo of a freshly generated plan.
+    Progress is kept in photo_prefetch_col, one document per trip.
+    """
+    references = collect_photo_references(plan_data)
+    trip_object_id = ObjectId(trip_id)
+    await photo_prefetch_col.replace_one(
+        {"trip_id": trip_object_id},
+        {
+            "trip_id": trip_object_id,
+            "status": "running",
+            "total": len(references),
+            "done": 0,
+            "failed": 0,
+            "started_at": datetime.utcnow(),
+            "finished_at": None,
+        },
+        upsert=True
+    )
+
+    semaphore = asyncio.Semaphore(PHOTO_PREFETCH_CONCURRENCY)
+
+    async def prefetch(reference: str):
+        async with semaphore:
+            try:
+                ok = await ensure_photo_cached(reference, maxwidth)
+            except Exception as e:
+                print(f"⚠️ Photo prefetch failed: {e}")
+                ok = False
+        await photo_prefetch_col.update_one(
+            {"trip_id": trip_object_id},
+            {"$inc": {"done" if ok else "failed": 1}}
+        )
+
+    await asyncio.gather(*(prefetch(reference) for reference in references))
+
+    await photo_prefetch_col.update_one(
+        {"trip_id": trip_object_id},
+        {"$set": {"status": "finished", "finished_at": datetime.utcnow()}}
+    )
+    print(f"🖼️ Photo prefetch finished for trip_id: {trip_id} ({len(references)} photos)")
@@ -0,0 +1,108 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+# Wspólny dla wszystkich workerów na hoście katalog ze zdjęciami
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "travelapp-photos"))
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Other workers write to the same directory, so rescan it from time to time
+PHOTO_CACHE_RESCAN_EVERY = int(os.getenv("PHOTO_CACHE_RESCAN_EVERY", "200"))
+
+_lock = threading.Lock()
+_approx_bytes = None
+_writes_since_scan = 0
+
+
+def photo_key(photoreference: str, maxwidth: int = 800) -> str:
+    return hashlib.sha256(f"{photoreference}:{maxwidth}".encode("utf-8")).hexdigest()
+
+
+def _photo_path(key: str) -> str:
+    return os.path.join(PHOTO_CACHE_DIR, key[:2], f"{key}.jpg")
+
+
+def get_photo_path(photoreference: str, maxwidth: int = 800):
+    """
+    Return the on-disk path of a cached photo, or None. A hit refreshes the
+    file's mtime, which is what LRU eviction orders by.
+    """
+    path = _photo_path(photo_key(photoreference, maxwidth))
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def store_photo(photoreference: str, content: bytes, maxwidth: int = 800) -> str:
+    global _approx_bytes, _writes_since_scan
+    path = _photo_path(photo_key(photoreference, maxwidth))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temp file first so readers never see a partial photo
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    with _lock:
+        _writes_since_scan += 1
+        if _approx_bytes is None or _writes_since_scan >= PHOTO_CACHE_RESCAN_EVERY:
+            _approx_bytes = _scan_size()
+            _writes_since_scan = 0
+        else:
+            _approx_bytes += len(content)
+
+        if _approx_bytes > PHOTO_CACHE_MAX_BYTES:
+            _approx_bytes = evict_photos(PHOTO_CACHE_MAX_BYTES)
+
+    return path
+
+
+def _list_photos():
+    photos = []
+    for root, _, files in os.walk(PHOTO_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".jpg"):
+                continue
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            photos.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+    return photos
+
+
+def _scan_size() -> int:
+    return sum(size for _, size, _ in _list_photos())
+
+
+def evict_photos(max_bytes: int) -> int:
+    """
+    Remove least recently used photos until the store is below 90% of
+    `max_bytes`. Returns the remaining size in bytes.
+    """
+    photos = sorted(_list_photos())
+    total = sum(size for _, size, _ in photos)
+    target = int(max_bytes * 0.9)
+
+    removed = 0
+    for _, size, path in photos:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    if removed:
+        print(f"🧹 Evicted {removed} photos from disk cache, {total} bytes left")
+    return total
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import asyncio
+
+# Aplikacje importują ten moduł jako pierwszy - od tej chwili liczony jest start
+_started = time.perf_counter()
+
+# 1 - po starcie leniwe klienty (LLM, agent, Google Maps) są budowane w tle,
+# 0 - dopiero przy pierwszym użyciu
+LAZY_WARMUP = os.getenv("LAZY_WARMUP", "1") == "1"
+
+_report = {"app": None, "ready_seconds": None, "modules_loaded": None, "checks": {}, "warmup": {}}
+_warmup_tasks = set()
+
+
+async def _warm_up(warmups: dict):
+    # Jeden po drugim, żeby nie zabierać wątków obsłudze pierwszych zapytań
+    for name, getter in warmups.items():
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(getter)
+            _report["warmup"][name] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            _report["warmup"][name] = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Warmup of {name} failed: {e}")
+
+
+def run_startup_checks(checks: dict):
+    """
+    Cheap configuration checks (API keys, backend name) run at startup
+    whatever LAZY_WARMUP says. A failure stops the startup, as it did when
+    the clients were still built on import.
+    """
+    failed = []
+    for name, check in checks.items():
+        try:
+            check()
+            _report["checks"][name] = "ok"
+        except Exception as e:
+            _report["checks"][name] = f"{type(e).__name__}: {e}"
+            failed.append(name)
+            print(f"🔴 Startup check {name} failed: {e}")
+    if failed:
+        raise RuntimeError(f"Startup checks failed: {', '.join(failed)}")
+
+
+def mark_ready(app_name: str, warmups: dict = None):
+    """
+    Called from the app's startup hook: records time-to-ready and, with
+    LAZY_WARMUP, builds the lazy clients in the background so the first
+    request does not pay for them. Import time per module is not measured
+    in the app - benchmarks/cold_start_bench.py reports it.
+    """
+    _report["app"] = app_name
+    _report["ready_seconds"] = round(time.perf_counter() - _started, 3)
+    _report["modules_loaded"] = len(sys.modules)
+    print(f"🚀 {app_name} ready in {_report['ready_seconds']:.2f} s ({_report['modules_loaded']} modules)")
+
+    if LAZY_WARMUP and warmups:
+        task = asyncio.create_task(_warm_up(warmups))
+        _warmup_tasks.add(task)
+        task.add_done_callback(_warmup_tasks.discard)
+
+
+def get_startup_report() -> dict:
+    return {**_report, "checks": dict(_report["checks"]), "warmup": dict(_report["warmup"]), "lazy_warmup": LAZY_WARMUP}
@@ -1,26 +1,53 @@
 import os
+import asyncio
+import time
+from functools import lru_cache
 from dotenv import load_dotenv
-import googlemaps
+from core.geocode_cache import get_cached_place, store_place, get_geocode_cache_stats, normalize_place_key
 
 load_dotenv()
-gmaps = googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY"))
+
+
+@lru_cache(maxsize=None)
+def get_gmaps():
+    # Klient tworzony przy pierwszym zapytaniu, nie przy starcie aplikacji
+    import googlemaps
+    return googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY"))
+
+
+def check_gmaps_config():
+    """
+    The key check googlemaps.Client does, without importing googlemaps or
+    building the client, so startup stays lazy.
+    """
+    key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not key:
+        raise ValueError("GOOGLE_MAPS_API_KEY is not set")
+    if not key.startswith("AIza"):
+        raise ValueError("GOOGLE_MAPS_API_KEY is not a valid API key")
+
+
+# Maksymalna liczba równoległych zapytań do Google Places podczas wzbogacania planu
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+
 
 async def enrich_place_with_googlemaps_client(place_name: str, city: str):
-    if not gmaps:
-        raise ValueError("Google Maps client is not initialized")
+    gmaps = get_gmaps()
 
-    find_result = gmaps.find_place(
-        input= place_name + ", " + city,
+    # googlemaps.Client is blocking, keep it off the event loop
+    find_result = await asyncio.to_thread(
+        gmaps.find_place,
+        input=place_name + ", " + city if city else place_name,
         input_type="textquery",
         fields=[
-            "place_id", 
-            "name", 
-            "formatted_address", 
+            "place_id",
+            "name",
+            "formatted_address",
             "geometry",
-            "photos" 
+            "photos"
         ]
     )
-    
+
     candidates = find_result.get("candidates", [])
     if not candidates:
         print(f"Nie znaleziono kandydatów dla: {place_name}")
@@ -29,6 +56,7 @@ async def enrich_place_with_googlemaps_client(place_name: str, city: str):
 
     place_id = candidates[0]["place_id"]
     # photo_url = None
+    photo_reference = None
     photos = result.get("photos")
     if photos:
         photo_reference = photos[0].get("photo_reference")
@@ -47,29 +75,132 @@ async def enrich_place_with_googlemaps_client(place_name: str, city: str):
     }
 
 
+async def lookup_place(place_name: str, city: str):
+    try:
+        hit, cached = await get_cached_place(place_name, city)
+        if hit:
+            return cached
+    except Exception as e:
+        print(f"⚠️ Geocode cache read failed: {e}")
+
+    enriched = await enrich_place_with_googlemaps_client(place_name, city)
+
+    try:
+        await store_place(place_name, city, enriched)
+    except Exception as e:
+        print(f"⚠️ Geocode cache write failed: {e}")
+    return enriched
+
+
+async def _timed_lookup(semaphore: asyncio.Semaphore, place_name: str, city: str):
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            enriched = await lookup_place(place_name, city)
+        except Exception as e:
+            print(f"⚠️ Enrichment failed for {place_name}, {city}: {e}")
+            enriched = None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    return enriched, {"place_name": place_name, "city": city, "ms": round(elapsed_ms, 1), "found": enriched is not None}
+
+
+ENRICHMENT_FIELDS = ("place_id", "lat", "lng", "formatted_address", "maps_url", "photo_reference")
+
+
+def _apply_enrichment(activity: dict, enriched: dict):
+    activity.update({
+        "place_id": enriched["place_id"],
+        "lat": enriched["lat"],
+        "lng": enriched["lng"],
+        "formatted_address": enriched["formatted_address"],
+        # "google_maps_url": enriched["google_maps_url"],
+        "maps_url": enriched["google_maps_url"],
+        # "photo_url": enriched.get("photo_url")
+        "photo_reference": enriched["photo_reference"]
+    })
 
-async def enrich_plan_with_locations(plan_data: dict) -> dict:
+
+async def enrich_plan_with_locations(plan_data: dict, concurrency: int = None, timings: list = None) -> dict:
+    """
+    Enrich every activity of the plan with Google Places data.
+
+    Activities are grouped by normalized (place, city) so every unique place
+    is looked up once. Lookups run concurrently (at most `concurrency` at
+    once) and are applied in plan order. Per-lookup timings are appended to
+    `timings` if given.
+    """
+    # key -> (place_name, city, [activities])
+    unique_places = {}
     for day in plan_data.get("daily_plan", []):
         city = day.get("city")
         for activity in day.get("activities", []):
             place_name = activity.get("location_name")
             if place_name and ("lat" not in activity or "lng" not in activity):
-                enriched = await enrich_place_with_googlemaps_client(place_name, city)
-                if enriched:
-                    activity.update({
-                    "place_id": enriched["place_id"],
-                    "lat": enriched["lat"],
-                    "lng": enriched["lng"],
-                    "formatted_address": enriched["formatted_address"],
-                    # "google_maps_url": enriched["google_maps_url"],
-                    "maps_url": enriched["google_maps_url"],
-                    # "photo_url": enriched.get("photo_url")
-                    "photo_reference": enriched["photo_reference"]
-                })
+                key = normalize_place_key(place_name, city)
+                unique_places.setdefault(key, (place_name, city, []))[2].append(activity)
+
+    if not unique_places:
+        return plan_data
+
+    semaphore = asyncio.Semaphore(concurrency or ENRICH_CONCURRENCY)
+    started = time.perf_counter()
+    lookups = list(unique_places.values())
+    results = await asyncio.gather(
+        *(_timed_lookup(semaphore, place_name, city) for place_name, city, _ in lookups)
+    )
+
+    activity_count = 0
+    for (_, _, activities), (enriched, timing) in zip(lookups, results):
+        activity_count += len(activities)
+        if enriched:
+            for activity in activities:
+                _apply_enrichment(activity, enriched)
+        if timings is not None:
+            timings.append({**timing, "activities": len(activities)})
 
+    total_ms = (time.perf_counter() - started) * 1000
+    slowest = max(timing["ms"] for _, timing in results)
+    print(f"🗺️ Enriched {activity_count} activities ({len(lookups)} unique places) in {total_ms:.0f} ms (slowest lookup {slowest:.0f} ms), cache: {get_geocode_cache_stats()}")
 
     return plan_data
 
 
+async def enrich_plan_incrementally(new_plan: dict, stored_plan: dict, concurrency: int = None, timings: list = None) -> dict:
+    """
+    Re-enrich an edited plan, geocoding only activities whose location_name
+    or city differs from the stored plan. Unchanged places keep their stored
+    place_id, coordinates and photo_reference.
+    """
+    known_places = {}
+    for day in (stored_plan or {}).get("daily_plan", []):
+        city = day.get("city")
+        for activity in day.get("activities", []):
+            place_name = activity.get("location_name")
+            if place_name and "lat" in activity and "lng" in activity:
+                known_places.setdefault(
+                    normalize_place_key(place_name, city),
+                    {field: activity[field] for field in ENRICHMENT_FIELDS if field in activity}
+                )
+
+    reused = 0
+    for day in new_plan.get("daily_plan", []):
+        city = day.get("city")
+        for activity in day.get("activities", []):
+            place_name = activity.get("location_name")
+            if not place_name:
+                continue
+            known = known_places.get(normalize_place_key(place_name, city))
+            if known:
+                activity.update(known)
+                reused += 1
+            else:
+                # Location changed - coordinates sent back by the client are stale
+                for field in ENRICHMENT_FIELDS:
+                    activity.pop(field, None)
+
+    print(f"♻️ Reused enrichment for {reused} unchanged activities")
+    return await enrich_plan_with_locations(new_plan, concurrency=concurrency, timings=timings)
+
+
 def get_place_photo_url(photo_reference: str, maxwidth: int = 800):
     return f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={maxwidth}&photoreference={photo_reference}&key={os.getenv('GOOGLE_MAPS_API_KEY')}"
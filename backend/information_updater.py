@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import List, Dict
+from bson import ObjectId
+from core.database import trips_information_col
+from travelplan.traveljson import validate_travel_information_paths
+from travelplan.json_patch import apply_patch, JsonPatchError
+from chains.information_update_chain import get_information_update_chain
+
+# Wiadomości przychodzące w odstępach krótszych niż debounce łączymy w jedną aktualizację
+INFORMATION_UPDATE_DEBOUNCE_SECONDS = float(os.getenv("INFORMATION_UPDATE_DEBOUNCE_SECONDS", "1.5"))
+# ...ale nie czekamy dłużej niż tyle od pierwszej wiadomości w serii
+INFORMATION_UPDATE_MAX_DELAY_SECONDS = float(os.getenv("INFORMATION_UPDATE_MAX_DELAY_SECONDS", "10"))
+INFORMATION_UPDATE_MAX_RETRIES = int(os.getenv("INFORMATION_UPDATE_MAX_RETRIES", "3"))
+
+# trip_id -> {"messages", "last_messages", "arrived", "worker", "running"}
+_trip_updates = {}
+_update_stats = {"scheduled_messages": 0, "llm_updates": 0, "conflicts": 0, "dropped": 0}
+
+
+def parse_information_patch(patch_text: str) -> list:
+    # Strict on purpose: repairing a cut-off patch would write the truncated values into the trip
+    start, end = patch_text.find("["), patch_text.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("No JSON Patch array in model output")
+    operations = json.loads(patch_text[start:end + 1])
+    if not isinstance(operations, list):
+        raise ValueError("JSON Patch must be an array of operations")
+    return operations
+
+
+def schedule_information_update(trip_id: str, user_message: str, last_messages: List[Dict]):
+    """
+    Queue a user message for the trip's information update. Messages that
+    arrive close together are folded into a single LLM update, and a trip
+    never has more than one update running at a time.
+    """
+    state = _trip_updates.get(trip_id)
+    if state is None:
+        state = _trip_updates[trip_id] = {
+            "messages": [],
+            "last_messages": [],
+            "arrived": asyncio.Event(),
+            "worker": None,
+            "running": False,
+        }
+
+    state["messages"].append(user_message)
+    state["last_messages"] = last_messages
+    state["arrived"].set()
+    _update_stats["scheduled_messages"] += 1
+
+    if state["worker"] is None:
+        state["worker"] = asyncio.create_task(_run_trip_updates(trip_id, state))
+
+
+async def _run_trip_updates(trip_id: str, state: dict):
+    try:
+        while state["messages"]:
+            burst_started = time.monotonic()
+            # Debounce: wait until the user stops typing (or the burst gets too long)
+            while True:
+                state["arrived"].clear()
+                remaining = INFORMATION_UPDATE_MAX_DELAY_SECONDS - (time.monotonic() - burst_started)
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(state["arrived"].wait(), min(INFORMATION_UPDATE_DEBOUNCE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            messages, state["messages"] = state["messages"], []
+            state["running"] = True
+            try:
+                await _apply_information_update(trip_id, messages, state["last_messages"])
+            except Exception as e:
+                print(f"🔴 Information update failed for trip_id {trip_id}: {e}")
+            finally:
+                state["running"] = False
+    finally:
+        # Nothing is awaited between the last empty check and here,
+        # so no message can slip in unnoticed
+        _trip_updates.pop(trip_id, None)
+
+
+async def _apply_information_update(trip_id: str, messages: List[str], last_messages: List[Dict]):
+    trip_object_id = ObjectId(trip_id)
+    doc = await trips_information_col.find_one({"trip_id": trip_object_id})
+    if not doc:
+        return
+
+    _update_stats["llm_updates"] += 1
+    patch_text = await get_information_update_chain().arun(
+        last_user_message="\n".join(messages),
+        message_history=json.dumps(last_messages),
+        current_plan=json.dumps(doc.get("data", {}), ensure_ascii=False)
+    )
+
+    try:
+        operations = parse_information_patch(patch_text)
+    except ValueError as e:
+        print(f"Plan JSON patch rejected: {str(e)}")
+        _update_stats["dropped"] += 1
+        return
+
+    if not operations:
+        print(f"✅ No information changes for trip_id: {trip_id}")
+        return
+
+    # Only what the patch writes is validated - older trips may carry fields the skeleton no longer has
+    touched_paths = [operation.get("path", "") for operation in operations if operation.get("op") in ("add", "replace", "copy", "move")]
+
+    for attempt in range(INFORMATION_UPDATE_MAX_RETRIES):
+        try:
+            new_data = apply_patch(doc.get("data", {}), operations)
+            validate_travel_information_paths(new_data, touched_paths, doc.get("data", {}))
+        except (ValueError, JsonPatchError) as e:
+            print(f"Plan JSON patch rejected: {str(e)}")
+            _update_stats["dropped"] += 1
+            return
+
+        # Optimistic concurrency: only write if nobody changed the document since we read it
+        version_filter = doc["version"] if "version" in doc else {"$exists": False}
+        result = await trips_information_col.update_one(
+            {"trip_id": trip_object_id, "version": version_filter},
+            {"$set": {"data": new_data, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+        )
+        if result.matched_count:
+            print(f"✅ Background plan update done for trip_id: {trip_id} ({len(operations)} patch operations, {len(messages)} messages)")
+            return
+
+        # Someone else wrote in the meantime - re-apply the same patch on the fresh document
+        _update_stats["conflicts"] += 1
+        doc = await trips_information_col.find_one({"trip_id": trip_object_id})
+        if not doc:
+            return
+
+    print(f"⚠️ Gave up information update for trip_id {trip_id} after {INFORMATION_UPDATE_MAX_RETRIES} conflicts")
+    _update_stats["dropped"] += 1
+
+
+def get_update_queue_stats() -> dict:
+    return {
+        "trips": len(_trip_updates),
+        "running": sum(1 for state in _trip_updates.values() if state["running"]),
+        "queued_messages": sum(len(state["messages"]) for state in _trip_updates.values()),
+        "per_trip": {trip_id: len(state["messages"]) for trip_id, state in _trip_updates.items()},
+        **_update_stats,
+    }
@@ -1,3 +1,4 @@
+from core.startup import run_startup_checks, mark_ready, get_startup_report
 from fastapi import FastAPI
 import api.users as users
 import api.trips as trips
@@ -7,6 +8,8 @@ import api.plans as plans
 import api.auth as auth
 import api.google_photo as photo
 from fastapi.middleware.cors import CORSMiddleware
+from core.http import close_http_client
+from enrich import check_gmaps_config
 
 app = FastAPI(title="Travel Planner App")
 
@@ -26,6 +29,22 @@ app.include_router(plans.router)
 app.include_router(photo.router)
 app.include_router(auth.router)
 
+
+@app.on_event("startup")
+async def report_ready():
+    run_startup_checks({"gmaps": check_gmaps_config})
+    mark_ready("main")
+
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    await close_http_client()
+
+
+@app.get("/startup")
+async def startup_report():
+    return get_startup_report()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
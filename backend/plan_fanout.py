@@ -0,0 +1,182 @@
+import os
+import json
+import asyncio
+from datetime import date
+from travelplan.json_repair import parse_llm_json, JsonRepairError
+from chains.plan_generator_chain import (
+    get_plan_generator_llm, get_plan_outline_llm, plan_outline_template, plan_day_template, json2_skeleton, day_skeleton
+)
+from chains.llm_cache import get_cached_completion, store_completion
+
+# Od tylu dni w górę plan generujemy dwufazowo (outline + dni równolegle)
+PLAN_FANOUT_MIN_DAYS = int(os.getenv("PLAN_FANOUT_MIN_DAYS", "5"))
+PLAN_FANOUT_CONCURRENCY = int(os.getenv("PLAN_FANOUT_CONCURRENCY", "4"))
+
+PLAN_MODES = ("auto", "single", "fanout")
+
+
+def estimate_trip_days(travel_information: dict) -> int:
+    if travel_information.get("duration_days"):
+        try:
+            return int(travel_information["duration_days"])
+        except (TypeError, ValueError):
+            pass
+
+    try:
+        start = date.fromisoformat(str(travel_information.get("start_date")))
+        end = date.fromisoformat(str(travel_information.get("end_date")))
+        return (end - start).days + 1
+    except ValueError:
+        pass
+
+    days = 0
+    for place in travel_information.get("places_to_visit") or []:
+        try:
+            days += int(place.get("duration_days") or 0)
+        except (TypeError, ValueError, AttributeError):
+            pass
+    return days
+
+
+def should_fan_out(travel_information: dict, mode: str = "auto") -> bool:
+    if mode == "auto":
+        return estimate_trip_days(travel_information) >= PLAN_FANOUT_MIN_DAYS
+    return mode == "fanout"
+
+
+async def _complete(llm, prompt: str, bypass_cache: bool):
+    """
+    Run a prompt through the LLM cache and parse the answer. The completion
+    is only cached once it parses.
+    """
+    text = None if bypass_cache else await get_cached_completion(llm, prompt)
+    from_cache = text is not None
+    if not from_cache:
+        response = await llm.ainvoke(prompt)
+        text = response.content
+
+    data = parse_llm_json(text)
+    if not from_cache:
+        await store_completion(llm, prompt, text)
+    return data
+
+
+def _outline_lines(outline_days: list) -> str:
+    return "\n".join(
+        f"Day {day.get('day')} ({day.get('date')}, {day.get('city')}): {day.get('theme')}"
+        for day in outline_days
+    )
+
+
+def _placeholder_day(outline_day: dict) -> dict:
+    day = json.loads(day_skeleton)
+    day.update({
+        "day": outline_day.get("day"),
+        "date": outline_day.get("date"),
+        "city": outline_day.get("city"),
+        "summary": outline_day.get("theme"),
+        "activities": [],
+    })
+    return day
+
+
+def _pin_to_outline(day: dict, outline_day: dict) -> dict:
+    # The outline decides where the traveler is on which day
+    for key in ("day", "date", "city"):
+        if outline_day.get(key) is not None:
+            day[key] = outline_day[key]
+    return day
+
+
+def merge_plan(outline: dict, days: list) -> dict:
+    """
+    Put the outline and the generated days together in the get_empty_plan2 shape.
+    """
+    plan = parse_llm_json(json2_skeleton)
+    for key in plan:
+        if key != "daily_plan" and outline.get(key) is not None:
+            plan[key] = outline[key]
+
+    plan["daily_plan"] = [
+        _pin_to_outline(day if isinstance(day, dict) else _placeholder_day(outline_day), outline_day)
+        for outline_day, day in zip(outline["days"], days)
+    ]
+
+    if not plan.get("duration_days"):
+        plan["duration_days"] = len(plan["daily_plan"])
+    return plan
+
+
+async def generate_plan_outline(travel_information: dict, user_about_info: str, bypass_cache: bool = False) -> dict:
+    prompt = plan_outline_template.format(
+        travel_information=json.dumps(travel_information, indent=2, ensure_ascii=False),
+        user_about_info=user_about_info
+    )
+    outline = await _complete(get_plan_outline_llm(), prompt, bypass_cache)
+    if not isinstance(outline, dict) or not isinstance(outline.get("days"), list):
+        raise ValueError("Plan outline has no days")
+    outline["days"] = [day for day in outline["days"] if isinstance(day, dict)]
+    if not outline["days"]:
+        raise ValueError("Plan outline has no days")
+    return outline
+
+
+async def generate_plan_fanout(travel_information: dict, user_about_info: str, bypass_cache: bool = False,
+                               on_day=None, concurrency: int = None) -> dict:
+    """
+    Two-phase plan generation: an outline with the city of every day, then
+    all days generated concurrently (at most `concurrency` at a time). Time
+    grows with the slowest day instead of the sum of all days, and no single
+    completion has to fit the whole trip.
+
+    on_day(index, day) is called as soon as each day is ready.
+    """
+    outline = await generate_plan_outline(travel_information, user_about_info, bypass_cache)
+    outline_days = outline["days"]
+    trip_outline = _outline_lines(outline_days)
+    travel_information_json = json.dumps(travel_information, ensure_ascii=False)
+    concurrency = concurrency or PLAN_FANOUT_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+    placeholders = []
+
+    async def generate_day(index: int, outline_day: dict):
+        prompt = plan_day_template.format(
+            travel_information=travel_information_json,
+            user_about_info=user_about_info,
+            trip_outline=trip_outline,
+            day=outline_day.get("day", index + 1),
+            date=outline_day.get("date"),
+            city=outline_day.get("city"),
+            theme=outline_day.get("theme"),
+            day_skeleton=day_skeleton
+        )
+        # Only an unusable answer falls back to the outline - GovernorBusy and
+        # provider errors propagate, so a failed run never replaces a stored plan
+        async with semaphore:
+            try:
+                day = await _complete(get_plan_generator_llm(), prompt, bypass_cache)
+                if not isinstance(day, dict):
+                    raise ValueError("day is not a JSON object")
+            except (JsonRepairError, ValueError) as e:
+                print(f"⚠️ Could not generate day {index + 1}, using the outline: {e}")
+                day = _placeholder_day(outline_day)
+                placeholders.append(index)
+
+        _pin_to_outline(day, outline_day)
+        if on_day is not None:
+            on_day(index, day)
+        return day
+
+    tasks = [asyncio.create_task(generate_day(index, outline_day)) for index, outline_day in enumerate(outline_days)]
+    try:
+        days = await asyncio.gather(*tasks)
+    except BaseException:
+        # One day failed for real - the rest would be thrown away anyway
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if len(placeholders) == len(days):
+        raise ValueError("No day of the plan could be generated")
+    print(f"🟢 Generated {len(days) - len(placeholders)} of {len(days)} days from the outline ({concurrency} at a time)")
+    return merge_plan(outline, list(days))
@@ -0,0 +1,294 @@
+import os
+import uuid
+import socket
+import asyncio
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from core.database import plan_jobs_col
+
+# Ile planów generujemy naraz w jednym procesie
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_POLL_SECONDS = float(os.getenv("PLAN_JOB_POLL_SECONDS", "2"))
+# Worker przedłuża dzierżawę joba co PLAN_JOB_HEARTBEAT_SECONDS; job, którego
+# dzierżawa wygasła (proces padł), może przejąć inny worker
+PLAN_JOB_LEASE_SECONDS = int(os.getenv("PLAN_JOB_LEASE_SECONDS", "60"))
+PLAN_JOB_HEARTBEAT_SECONDS = float(os.getenv("PLAN_JOB_HEARTBEAT_SECONDS", "15"))
+PLAN_JOB_ENQUEUE_ATTEMPTS = 3
+# Job, który tyle razy zabił swój proces (OOM, trujące dane), nie jest już przejmowany
+PLAN_JOB_MAX_ATTEMPTS = int(os.getenv("PLAN_JOB_MAX_ATTEMPTS", "3"))
+PLAN_JOB_TTL_DAYS = int(os.getenv("PLAN_JOB_TTL_DAYS", "7"))
+
+FINISHED_STATES = ("succeeded", "failed")
+
+# Identifies the jobs held by this process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_handler = None
+_workers = []
+_job_available = asyncio.Event()
+_jobs_changed = asyncio.Condition()
+_indexes_ready = False
+
+
+def register_job_handler(handler):
+    """
+    handler(job) is awaited for every claimed job and returns the result
+    stored on the job. Raising marks the job as failed.
+    """
+    global _handler
+    _handler = handler
+
+
+async def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    # Najwyżej jeden aktywny (queued/running) job na wycieczkę
+    await plan_jobs_col.create_index(
+        "trip_id", unique=True, name="one_active_job_per_trip",
+        partialFilterExpression={"active": True}
+    )
+    await plan_jobs_col.create_index([("state", 1), ("created_at", 1)])
+    await plan_jobs_col.create_index("expires_at", expireAfterSeconds=0)
+    _indexes_ready = True
+
+
+async def _notify_subscribers():
+    async with _jobs_changed:
+        _jobs_changed.notify_all()
+
+
+def serialize_job(job: dict) -> dict:
+    job = dict(job)
+    job["_id"] = str(job["_id"])
+    job["trip_id"] = str(job["trip_id"])
+    job.pop("active", None)
+    job.pop("expires_at", None)
+    return job
+
+
+async def enqueue_plan_job(trip_id: str, params: dict):
+    """
+    Queue plan generation for a trip. Returns (job, created); if the trip
+    already has a queued or running job, that job is returned instead.
+    """
+    await _ensure_indexes()
+    trip_object_id = ObjectId(trip_id)
+    job = {
+        "trip_id": trip_object_id,
+        "params": params,
+        "state": "queued",
+        "active": True,
+        "attempts": 0,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "worker_id": None,
+        "lease_until": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+    for _ in range(PLAN_JOB_ENQUEUE_ATTEMPTS):
+        try:
+            result = await plan_jobs_col.insert_one(job)
+            break
+        except DuplicateKeyError:
+            existing = await plan_jobs_col.find_one({"trip_id": trip_object_id, "active": True})
+            if existing:
+                return existing, False
+            # The active job finished between the insert and the lookup - try again
+            job.pop("_id", None)
+    else:
+        raise RuntimeError(f"Could not enqueue a plan job for trip {trip_id}")
+
+    job["_id"] = result.inserted_id
+    _job_available.set()
+    await _notify_subscribers()
+    return job, True
+
+
+async def get_plan_job(job_id: str):
+    try:
+        return await plan_jobs_col.find_one({"_id": ObjectId(job_id)})
+    except Exception:
+        return None
+
+
+async def watch_plan_job(job_id: str):
+    """
+    Yield the job every time its state changes, until it finishes. Wakes up
+    on changes made by this process and polls for the rest.
+    """
+    last_state = None
+    while True:
+        job = await get_plan_job(job_id)
+        if job is None:
+            return
+        if job["state"] != last_state:
+            last_state = job["state"]
+            yield job
+        if job["state"] in FINISHED_STATES:
+            return
+
+        async with _jobs_changed:
+            try:
+                await asyncio.wait_for(_jobs_changed.wait(), PLAN_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _fail_exhausted_jobs():
+    """
+    Fail the jobs whose lease expired on their last allowed attempt, so they
+    stop holding the trip's active slot.
+    """
+    now = datetime.utcnow()
+    result = await plan_jobs_col.update_many(
+        {"state": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": PLAN_JOB_MAX_ATTEMPTS}},
+        {"$set": {
+            "state": "failed",
+            "active": False,
+            "finished_at": now,
+            "error": f"Worker lost {PLAN_JOB_MAX_ATTEMPTS} times, giving up",
+            "lease_until": None,
+            "expires_at": now + timedelta(days=PLAN_JOB_TTL_DAYS),
+        }}
+    )
+    if result.modified_count:
+        print(f"🔴 Gave up {result.modified_count} plan job(s) after {PLAN_JOB_MAX_ATTEMPTS} attempts")
+        await _notify_subscribers()
+
+
+async def _claim_job():
+    """
+    Take the oldest queued job, or a running one whose worker stopped
+    renewing its lease (crashed or killed process) and which still has
+    attempts left.
+    """
+    now = datetime.utcnow()
+    return await plan_jobs_col.find_one_and_update(
+        {"$or": [
+            {"state": "queued"},
+            {"state": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": PLAN_JOB_MAX_ATTEMPTS}},
+        ]},
+        {
+            "$set": {
+                "state": "running",
+                "started_at": now,
+                "worker_id": WORKER_ID,
+                "lease_until": now + timedelta(seconds=PLAN_JOB_LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _keep_lease(job: dict):
+    while True:
+        await asyncio.sleep(PLAN_JOB_HEARTBEAT_SECONDS)
+        try:
+            result = await plan_jobs_col.update_one(
+                {"_id": job["_id"], "worker_id": WORKER_ID, "state": "running"},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=PLAN_JOB_LEASE_SECONDS)}}
+            )
+        except Exception as e:
+            # Try again on the next beat, the lease is longer than one interval
+            print(f"⚠️ Could not renew the lease on plan job {job['_id']}: {e}")
+            continue
+        if not result.matched_count:
+            print(f"⚠️ Lost the lease on plan job {job['_id']}")
+            return
+
+
+async def _finish_job(job: dict, state: str, result=None, error: str = None):
+    finished_at = datetime.utcnow()
+    # Only the worker holding the lease may finish the job
+    update = await plan_jobs_col.update_one(
+        {"_id": job["_id"], "worker_id": WORKER_ID},
+        {"$set": {
+            "state": state,
+            "active": False,
+            "finished_at": finished_at,
+            "result": result,
+            "error": error,
+            "queue_seconds": (job["started_at"] - job["created_at"]).total_seconds(),
+            "run_seconds": (finished_at - job["started_at"]).total_seconds(),
+            "lease_until": None,
+            "expires_at": finished_at + timedelta(days=PLAN_JOB_TTL_DAYS),
+        }}
+    )
+    if not update.matched_count:
+        print(f"⚠️ Plan job {job['_id']} was taken over by another worker, result dropped")
+    await _notify_subscribers()
+
+
+async def _worker(number: int):
+    while True:
+        try:
+            await _fail_exhausted_jobs()
+            job = await _claim_job()
+        except Exception as e:
+            print(f"⚠️ Plan job worker {number} could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            _job_available.clear()
+            try:
+                await asyncio.wait_for(_job_available.wait(), PLAN_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _notify_subscribers()
+        retry_note = f" (attempt {job['attempts']})" if job["attempts"] > 1 else ""
+        print(f"🟢 Plan job {job['_id']} started for trip_id: {job['trip_id']}{retry_note}")
+        heartbeat = asyncio.create_task(_keep_lease(job))
+        try:
+            result = await _handler(job)
+        except asyncio.CancelledError:
+            heartbeat.cancel()
+            # Shutdown - hand the job back so another worker can pick it up;
+            # a clean hand-back does not use up an attempt
+            await plan_jobs_col.update_one(
+                {"_id": job["_id"], "worker_id": WORKER_ID},
+                {
+                    "$set": {"state": "queued", "started_at": None, "worker_id": None, "lease_until": None},
+                    "$inc": {"attempts": -1}
+                }
+            )
+            raise
+        except Exception as e:
+            heartbeat.cancel()
+            detail = getattr(e, "detail", None) or str(e)
+            print(f"🔴 Plan job {job['_id']} failed: {detail}")
+            await _finish_job(job, "failed", error=detail)
+        else:
+            heartbeat.cancel()
+            print(f"✅ Plan job {job['_id']} done for trip_id: {job['trip_id']}")
+            await _finish_job(job, "succeeded", result=result)
+
+
+async def start_plan_workers(concurrency: int = None):
+    if _handler is None:
+        raise RuntimeError("No plan job handler registered")
+    await _ensure_indexes()
+    for number in range(concurrency or PLAN_JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(number)))
+
+
+async def stop_plan_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def get_plan_job_stats() -> dict:
+    counts = {state: 0 for state in ("queued", "running", *FINISHED_STATES)}
+    async for row in plan_jobs_col.aggregate([{"$group": {"_id": "$state", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return {"worker_id": WORKER_ID, "workers": len(_workers), **counts}
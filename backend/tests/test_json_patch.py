@@ -0,0 +1,26 @@
+import pytest
+
+from travelplan.json_patch import apply_patch, JsonPatchError
+
+
+def test_replace_and_add_write_the_value():
+    document = {"start_date": "2025-06-01", "cities": ["Rome"]}
+    patched = apply_patch(document, [
+        {"op": "replace", "path": "/start_date", "value": "2025-06-02"},
+        {"op": "add", "path": "/cities/-", "value": "Florence"},
+    ])
+    assert patched == {"start_date": "2025-06-02", "cities": ["Rome", "Florence"]}
+    assert document == {"start_date": "2025-06-01", "cities": ["Rome"]}
+
+
+def test_explicit_null_value_is_written():
+    patched = apply_patch({"end_date": "2025-06-09"}, [{"op": "replace", "path": "/end_date", "value": None}])
+    assert patched == {"end_date": None}
+
+
+@pytest.mark.parametrize("op", ["add", "replace", "test"])
+def test_operation_without_value_is_rejected(op):
+    document = {"start_date": "2025-06-01"}
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [{"op": op, "path": "/start_date"}])
+    assert document == {"start_date": "2025-06-01"}
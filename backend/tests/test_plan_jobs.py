@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import plan_jobs
+
+
+def _matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, option) for option in condition):
+                return False
+            continue
+        value = document.get(key)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if value is None:
+                    return False
+                if operator == "$lt" and not value < operand:
+                    return False
+                if operator == "$gte" and not value >= operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _apply(document: dict, update: dict):
+    document.update(update.get("$set", {}))
+    for key, amount in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + amount
+
+
+class FakeJobsCollection:
+    """Just the queries plan_jobs runs against plan-jobs, on a list in memory."""
+
+    def __init__(self, jobs: list):
+        self.jobs = jobs
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None):
+        candidates = sorted((job for job in self.jobs if _matches(job, query)), key=lambda job: job["created_at"])
+        if not candidates:
+            return None
+        _apply(candidates[0], update)
+        return dict(candidates[0])
+
+    async def update_many(self, query, update):
+        matched = [job for job in self.jobs if _matches(job, query)]
+        for job in matched:
+            _apply(job, update)
+        return SimpleNamespace(matched_count=len(matched), modified_count=len(matched))
+
+
+def _job(attempts: int, lease_expired: bool) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": f"job-{attempts}",
+        "state": "running",
+        "active": True,
+        "attempts": attempts,
+        "created_at": now - timedelta(minutes=10),
+        "worker_id": "dead-worker",
+        "lease_until": now - timedelta(seconds=1) if lease_expired else now + timedelta(minutes=1),
+    }
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(plan_jobs, "plan_jobs_col", FakeJobsCollection(jobs))
+    return jobs
+
+
+def test_expired_job_with_attempts_left_is_reclaimed(jobs):
+    jobs.append(_job(attempts=plan_jobs.PLAN_JOB_MAX_ATTEMPTS - 1, lease_expired=True))
+
+    claimed = asyncio.run(plan_jobs._claim_job())
+
+    assert claimed["worker_id"] == plan_jobs.WORKER_ID
+    assert claimed["attempts"] == plan_jobs.PLAN_JOB_MAX_ATTEMPTS
+
+
+def test_exhausted_job_is_failed_instead_of_reclaimed(jobs):
+    jobs.append(_job(attempts=plan_jobs.PLAN_JOB_MAX_ATTEMPTS, lease_expired=True))
+
+    assert asyncio.run(plan_jobs._claim_job()) is None
+    asyncio.run(plan_jobs._fail_exhausted_jobs())
+
+    assert jobs[0]["state"] == "failed"
+    assert jobs[0]["active"] is False
+    assert jobs[0]["attempts"] == plan_jobs.PLAN_JOB_MAX_ATTEMPTS
+
+
+def test_job_with_live_lease_is_left_alone(jobs):
+    jobs.append(_job(attempts=plan_jobs.PLAN_JOB_MAX_ATTEMPTS, lease_expired=False))
+
+    assert asyncio.run(plan_jobs._claim_job()) is None
+    asyncio.run(plan_jobs._fail_exhausted_jobs())
+
+    assert jobs[0]["state"] == "running"
+    assert jobs[0]["active"] is True
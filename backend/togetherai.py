@@ -1,5 +1,7 @@
+from core.startup import run_startup_checks, mark_ready, get_startup_report
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict
 from datetime import datetime
@@ -8,12 +10,28 @@ import os
 import json
 import asyncio
 from dotenv import load_dotenv
-from core.database import plans_col, trips_col, users_col, trips_information_col
+from core.database import plans_col, trips_col, users_col, trips_information_col, plan_drafts_col
 from travelplan.traveljson import get_empty_plan2
-from chains.chat_chain import chat_chain
-from chains.plan_generator_chain import plan_generator_chain, json2_skeleton
-from chains.information_update_chain import information_update_chain
-from enrich import enrich_plan_with_locations
+from travelplan.plan_stream import DailyPlanStreamParser
+from travelplan.json_repair import parse_llm_json, JsonRepairError
+from chains.chat_chain import get_chat_chain
+from chains.plan_generator_chain import get_plan_generator_llm, get_plan_outline_llm, json2_skeleton
+from chains.chat_memory import load_chat_history, update_chat_summary
+from chains.summary_chain import get_summary_chain
+from chains.information_update_chain import get_information_update_chain
+from chains.prompt_budget import assemble_chat_inputs, get_token_encoding
+from chains.llm_cache import get_cached_completion, store_completion
+from chains.governor import GovernorBusy, get_governor_stats
+from chains.llm_backend import check_llm_config
+from enrich import enrich_plan_with_locations, check_gmaps_config
+from information_updater import schedule_information_update, get_update_queue_stats
+from plan_fanout import generate_plan_fanout, should_fan_out, PLAN_MODES
+from plan_jobs import (
+    register_job_handler, start_plan_workers, stop_plan_workers, enqueue_plan_job,
+    get_plan_job, watch_plan_job, serialize_job, get_plan_job_stats
+)
+from core.photo_prefetch import prefetch_plan_photos
+from core.http import close_http_client
 from api.models import PlanDB
 
 load_dotenv()
@@ -28,6 +46,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    await close_http_client()
+
+
+@app.exception_handler(GovernorBusy)
+async def governor_busy_handler(request, exc: GovernorBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after + 0.5))}
+    )
+
 # MODELE REQUESTÓW
 class TematRequest(BaseModel):
     message: str
@@ -53,22 +85,17 @@ class Demo(BaseModel):
 #     return {"message": req.message, "response": result}
 
 
-async def try_parse_json(response_text: str, retries: int = 2):
-    for attempt in range(retries + 1):
-        try:
-            start = response_text.find("{")
-            end = response_text.rfind("}") + 1
-            json_str = response_text[start:end]
-            return json.loads(json_str)
-        except Exception as e:
-            print(f"🔴 JSON parsing error (attempt {attempt + 1}): {str(e)}")
-            if attempt == retries:
-                raise HTTPException(status_code=500, detail=f"JSON Error: {str(e)}")
-            await asyncio.sleep(1)
+def try_parse_json(response_text: str):
+    # The same model output re-parsed after a sleep fails the same way, so repair it instead
+    start = response_text.find("{")
+    try:
+        return parse_llm_json(response_text[start:] if start != -1 else response_text)
+    except JsonRepairError as e:
+        print(f"🔴 JSON parsing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"JSON Error: {str(e)}")
 
 
-@app.post("/generate-plan/{trip_id}", response_model=PlanDB)
-async def generate_and_save_plan(trip_id: str):
+async def load_plan_sources(trip_id: str):
     trip_main_doc = await trips_col.find_one({"_id": ObjectId(trip_id)})
     if not trip_main_doc:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -87,8 +114,10 @@ async def generate_and_save_plan(trip_id: str):
     if not plan_info_doc:
         raise HTTPException(status_code=404, detail="Plan source data not found")
 
-    travel_information = plan_info_doc.get("data", {})
+    return plan_info_doc.get("data", {}), user_about_info
+
 
+def build_plan_prompt(travel_information: dict, user_about_info: str) -> str:
     raw_prompt = f"""
 Generate a short travel plan based on the data from TRAVEL INFORMATION.
 Fill in the plan in JSON. If any data is missing – add your own interesting suggestions for attractions.
@@ -108,18 +137,15 @@ INFORMATION FROM USER:
 
 JSON:
 {json2_skeleton}
-""" 
+"""
 
-    response = await plan_generator_chain.llm.ainvoke(raw_prompt)
-    response_text = response.content
-    print(f"🟢 Raw model response:\n{response_text}\n")
+    return raw_prompt
 
-    plan_data = await try_parse_json(response_text, retries=2)
-    enriched_plan = await enrich_plan_with_locations(plan_data)
 
+async def save_generated_plan(trip_id: str, plan_data: dict) -> dict:
     plan_doc = {
         "trip_id": ObjectId(trip_id),
-        "data": enriched_plan,
+        "data": plan_data,
         "updated_at": datetime.utcnow()
     }
 
@@ -132,10 +158,226 @@ JSON:
 
     new_plan["_id"] = str(new_plan["_id"])
     new_plan["trip_id"] = str(new_plan["trip_id"])
+    return new_plan
+
+
+async def finish_plan_draft(trip_object_id: ObjectId, status: str, error: str = None):
+    await plan_drafts_col.update_one(
+        {"trip_id": trip_object_id},
+        {"$set": {"status": status, "error": error, "updated_at": datetime.utcnow()}}
+    )
+
+
+def check_plan_mode(mode: str):
+    if mode not in PLAN_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(PLAN_MODES)}")
+
+
+async def generate_plan_fanout_or_500(travel_information: dict, user_about_info: str, bypass_cache: bool, on_day=None) -> dict:
+    try:
+        return await generate_plan_fanout(travel_information, user_about_info, bypass_cache=bypass_cache, on_day=on_day)
+    except ValueError as e:
+        print(f"🔴 Plan outline error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Plan outline error: {str(e)}")
+
+
+async def generate_plan_for_trip(trip_id: str, bypass_cache: bool = False, mode: str = "auto"):
+    """
+    Generate, enrich and store the plan of a trip. Returns (stored plan, enriched plan data).
+    mode: "single" asks for the whole plan in one completion, "fanout" builds
+    an outline and generates the days in parallel, "auto" fans out for trips
+    of PLAN_FANOUT_MIN_DAYS days or more.
+    """
+    travel_information, user_about_info = await load_plan_sources(trip_id)
+
+    if should_fan_out(travel_information, mode):
+        plan_data = await generate_plan_fanout_or_500(travel_information, user_about_info, bypass_cache)
+    else:
+        raw_prompt = build_plan_prompt(travel_information, user_about_info)
+        llm = get_plan_generator_llm()
+
+        # Same travel information and user info as last time -> same answer, no LLM call
+        response_text = None if bypass_cache else await get_cached_completion(llm, raw_prompt)
+        from_cache = response_text is not None
+        if not from_cache:
+            response = await llm.ainvoke(raw_prompt)
+            response_text = response.content
+            print(f"🟢 Raw model response:\n{response_text}\n")
+
+        plan_data = try_parse_json(response_text)
+        if not from_cache:
+            await store_completion(llm, raw_prompt, response_text)
+
+    enriched_plan = await enrich_plan_with_locations(plan_data)
+    new_plan = await save_generated_plan(trip_id, enriched_plan)
+    return new_plan, enriched_plan
+
+
+@app.post("/generate-plan/{trip_id}", response_model=PlanDB)
+async def generate_and_save_plan(trip_id: str, background_tasks: BackgroundTasks, bypass_cache: bool = False, mode: str = "auto"):
+    check_plan_mode(mode)
+    new_plan, enriched_plan = await generate_plan_for_trip(trip_id, bypass_cache, mode)
+
+    # Warm the photo cache so the plan page is served from disk on first open
+    background_tasks.add_task(prefetch_plan_photos, trip_id, enriched_plan)
 
     return new_plan
 
 
+@app.post("/generate-plan/{trip_id}/stream")
+async def stream_and_save_plan(trip_id: str, background_tasks: BackgroundTasks, bypass_cache: bool = False, mode: str = "auto"):
+    """
+    Server-sent events variant of /generate-plan/{trip_id}. Every daily_plan
+    entry is enriched and stored in plan_drafts_col as soon as the model
+    finishes writing it, and sent to the client as a day event. The stored
+    plan is only replaced once the whole run succeeds; a failed or cancelled
+    run leaves it as it was and marks the draft failed. The end event carries
+    the complete stored plan. With fan-out, days arrive in completion order.
+    """
+    check_plan_mode(mode)
+    travel_information, user_about_info = await load_plan_sources(trip_id)
+    fan_out = should_fan_out(travel_information, mode)
+    trip_object_id = ObjectId(trip_id)
+    llm = get_plan_generator_llm()
+    raw_prompt = None if fan_out else build_plan_prompt(travel_information, user_about_info)
+    cached_text = None if bypass_cache or fan_out else await get_cached_completion(llm, raw_prompt)
+
+    await plan_drafts_col.replace_one(
+        {"trip_id": trip_object_id},
+        {
+            "trip_id": trip_object_id,
+            "status": "generating",
+            "daily_plan": [],
+            "error": None,
+            "started_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        },
+        upsert=True
+    )
+
+    events = asyncio.Queue()
+    finished = {}
+
+    async def enrich_and_store_day(index: int, day: dict):
+        try:
+            await enrich_plan_with_locations({"daily_plan": [day]})
+            await plan_drafts_col.update_one(
+                {"trip_id": trip_object_id},
+                {"$set": {f"daily_plan.{index}": day, "updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            print(f"⚠️ Could not store streamed day {index}: {e}")
+        await events.put(("day", {"index": index, "day": day}))
+        return index, day
+
+    async def generate():
+        parser = DailyPlanStreamParser(parse=parse_llm_json)
+        day_tasks = []
+        try:
+            if fan_out:
+                plan_data = await generate_plan_fanout_or_500(
+                    travel_information, user_about_info, bypass_cache,
+                    on_day=lambda index, day: day_tasks.append(asyncio.create_task(enrich_and_store_day(index, day)))
+                )
+                await asyncio.gather(*day_tasks)
+                enriched_plan = await enrich_plan_with_locations(plan_data)
+                new_plan = await save_generated_plan(trip_id, enriched_plan)
+                await finish_plan_draft(trip_object_id, "done")
+                finished["plan"] = enriched_plan
+                await events.put(("end", new_plan))
+                return
+
+            if cached_text is not None:
+                for index, day in parser.feed(cached_text):
+                    day_tasks.append(asyncio.create_task(enrich_and_store_day(index, day)))
+            else:
+                async for chunk in llm.astream(raw_prompt):
+                    for index, day in parser.feed(chunk.content):
+                        # Enrichment overlaps with the rest of the generation
+                        day_tasks.append(asyncio.create_task(enrich_and_store_day(index, day)))
+
+            response_text = parser.text
+            print(f"🟢 Raw model response:\n{response_text}\n")
+            streamed_days = dict(await asyncio.gather(*day_tasks))
+
+            plan_data = try_parse_json(response_text)
+            if cached_text is None:
+                await store_completion(llm, raw_prompt, response_text)
+            for index, day in streamed_days.items():
+                if index < len(plan_data.get("daily_plan", [])):
+                    plan_data["daily_plan"][index] = day
+            # Picks up days that could not be parsed while streaming
+            enriched_plan = await enrich_plan_with_locations(plan_data)
+
+            new_plan = await save_generated_plan(trip_id, enriched_plan)
+            await finish_plan_draft(trip_object_id, "done")
+            finished["plan"] = enriched_plan
+            await events.put(("end", new_plan))
+        except asyncio.CancelledError:
+            # Client went away - the stored plan was never touched
+            print(f"⚠️ Streaming plan generation cancelled for trip {trip_id}")
+            await finish_plan_draft(trip_object_id, "failed", "cancelled")
+            raise
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"🔴 Streaming plan generation failed: {detail}")
+            await finish_plan_draft(trip_object_id, "failed", detail)
+            await events.put(("error", {"detail": detail}))
+        finally:
+            for task in day_tasks:
+                task.cancel()
+
+    async def event_stream():
+        generator_task = asyncio.create_task(generate())
+        try:
+            while True:
+                event, data = await events.get()
+                yield sse_event(event, data)
+                if event in ("end", "error"):
+                    break
+        finally:
+            generator_task.cancel()
+
+    async def prefetch_after_stream():
+        if "plan" in finished:
+            await prefetch_plan_photos(trip_id, finished["plan"])
+
+    background_tasks.add_task(prefetch_after_stream)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def extract_booking_link(tool_steps) -> str:
+    for tool_name, observation in tool_steps:
+        if tool_name == "flight_searcher":
+            try:
+                flight_data = json.loads(observation)
+                if isinstance(flight_data, list) and len(flight_data) > 0:
+                    return flight_data[0].get("booking_link")
+            except (json.JSONDecodeError, IndexError, KeyError) as e:
+                print(f"⚠️  Could not extract booking link from tool observation: {e}")
+    return None
+
+
+def with_bot_reply(last_messages: List[Dict], bot_response_text: str) -> List[Dict]:
+    """
+    The frontend's last messages plus the assistant's answer, so the
+    information update sees what the user was replying to next time.
+    """
+    if not bot_response_text:
+        return last_messages
+    reply = {"text": bot_response_text, "isUser": False, "timestamp": datetime.utcnow().isoformat()}
+    return (list(last_messages) + [reply])[-3:]
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
 @app.post("/generate-message-and-update-information/")
 async def generate_message_and_update_plan(req: Demo, background_tasks: BackgroundTasks):
     # bot_response = await chat_chain.arun(message=req.user_message)
@@ -143,28 +385,23 @@ async def generate_message_and_update_plan(req: Demo, background_tasks: Backgrou
     plan_doc = await trips_information_col.find_one({"trip_id": ObjectId(req.trip_id)})
 
 
-    res = await chat_chain.ainvoke({"input": req.user_message, "trip_gathered_information": plan_doc})
+    summary, history = await load_chat_history(req.trip_id, req.user_message)
+
+    res = await get_chat_chain().ainvoke(assemble_chat_inputs(req.user_message, plan_doc, summary, history))
     bot_response_text = res["output"]
     print(res)
 
 
 
-    booking_link = None
-    if "intermediate_steps" in res:
-        for action, observation in res["intermediate_steps"]:
-            if action.tool == "flight_searcher":
-                try:
-                    flight_data = json.loads(observation)
-                    if isinstance(flight_data, list) and len(flight_data) > 0:
-                        booking_link = flight_data[0].get("booking_link")
-                        break
-                except (json.JSONDecodeError, IndexError, KeyError) as e:
-                    print(f"⚠️  Could not extract booking link from tool observation: {e}")
+    booking_link = extract_booking_link(
+        (action.tool, observation) for action, observation in res.get("intermediate_steps", [])
+    )
 
     print(f"✅ Bot response: {bot_response_text}")
     print(f"🔗 Captured link: {booking_link}")
 
-    background_tasks.add_task(update_plan_in_background, req.trip_id, req.user_message, req.last_messages, plan_doc)
+    schedule_information_update(req.trip_id, req.user_message, with_bot_reply(req.last_messages, bot_response_text))
+    background_tasks.add_task(update_chat_summary, req.trip_id)
     # print(bot_response)
 
 
@@ -178,34 +415,185 @@ async def generate_message_and_update_plan(req: Demo, background_tasks: Backgrou
         }
     }
 
-# async def update_plan_in_background(trip_id: str, user_message: str, last_messages: List[Dict]):
-
-    # plan_doc = await trips_information_col.find_one({"trip_id": ObjectId(trip_id)})
-    # if not plan_doc:
-    #     return
-async def update_plan_in_background(trip_id: str, user_message: str, last_messages: List[Dict], plan_doc: dict):
-    current_plan = plan_doc.get("data", {})
-    plan_json_text = await information_update_chain.arun(
-        last_user_message=user_message,
-        message_history=json.dumps(last_messages),
-        current_plan=json.dumps(current_plan)
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+@app.post("/generate-message-and-update-information/stream")
+async def stream_message_and_update_plan(req: Demo, background_tasks: BackgroundTasks):
+    """
+    Server-sent events variant of /generate-message-and-update-information/.
+    Emits tool_start / tool_end while the agent works, token events with the
+    Final Answer as it is generated, and an end event with the full text and
+    captured booking link.
+    """
+    plan_doc = await trips_information_col.find_one({"trip_id": ObjectId(req.trip_id)})
+    summary, history = await load_chat_history(req.trip_id, req.user_message)
+    chat_inputs = assemble_chat_inputs(req.user_message, plan_doc, summary, history)
+
+    async def event_stream():
+        tool_steps = []
+        bot_response_text = None
+        llm_text = ""
+        answer_started = False
+        streamed_answer = False
+
+        try:
+            async for event in get_chat_chain().astream_events(chat_inputs, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_start":
+                    llm_text = ""
+                    answer_started = False
+                elif kind == "on_chat_model_stream":
+                    token = event["data"]["chunk"].content
+                    if answer_started:
+                        streamed_answer = True
+                        yield sse_event("token", {"text": token})
+                        continue
+                    # The marker can be split across chunks - wait until it is complete
+                    llm_text += token
+                    marker_at = llm_text.find(FINAL_ANSWER_MARKER)
+                    if marker_at != -1:
+                        answer_started = True
+                        answer_head = llm_text[marker_at + len(FINAL_ANSWER_MARKER):].lstrip()
+                        if answer_head:
+                            streamed_answer = True
+                            yield sse_event("token", {"text": answer_head})
+                elif kind == "on_tool_start":
+                    yield sse_event("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+                elif kind == "on_tool_end":
+                    observation = event["data"].get("output")
+                    observation = getattr(observation, "content", observation)
+                    tool_steps.append((event["name"], str(observation)))
+                    yield sse_event("tool_end", {"tool": event["name"]})
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    bot_response_text = event["data"]["output"]["output"]
+        except Exception as e:
+            print(f"🔴 Streaming chat failed: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        if not streamed_answer and bot_response_text:
+            yield sse_event("token", {"text": bot_response_text})
+
+        booking_link = extract_booking_link(tool_steps)
+        print(f"✅ Bot response: {bot_response_text}")
+        print(f"🔗 Captured link: {booking_link}")
+
+        yield sse_event("end", {
+            "trip_id": req.trip_id,
+            "bot_response": {
+                "text": bot_response_text,
+                "link": booking_link
+            }
+        })
+
+        # Only once the answer is complete - a failed stream returns above and updates nothing
+        schedule_information_update(req.trip_id, req.user_message, with_bot_reply(req.last_messages, bot_response_text))
+
+    # Runs after the stream is finished
+    background_tasks.add_task(update_chat_summary, req.trip_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-    try:
-        start = plan_json_text.find("{")
-        end = plan_json_text.rfind("}") + 1
-        new_plan = json.loads(plan_json_text[start:end])
-    except Exception as e:
-        print(f"Plan JSON parsing failed: {str(e)}")
-        return
-
-    await trips_information_col.update_one(
-        {"trip_id": ObjectId(trip_id)},
-        {"$set": {"data": new_plan, "updated_at": datetime.utcnow()}}
+
+_prefetch_tasks = set()
+
+
+async def run_plan_job(job: dict) -> dict:
+    trip_id = str(job["trip_id"])
+    new_plan, enriched_plan = await generate_plan_for_trip(trip_id, **job.get("params", {}))
+    prefetch = asyncio.create_task(prefetch_plan_photos(trip_id, enriched_plan))
+    _prefetch_tasks.add(prefetch)
+    prefetch.add_done_callback(_prefetch_tasks.discard)
+    return {"plan_id": new_plan["_id"]}
+
+
+register_job_handler(run_plan_job)
+
+
+@app.on_event("startup")
+async def start_plan_job_workers():
+    run_startup_checks({
+        "llm_config": check_llm_config,
+        "gmaps": check_gmaps_config,
+    })
+    await start_plan_workers()
+    mark_ready("togetherai", {
+        "chat_chain": get_chat_chain,
+        "plan_generator_llm": get_plan_generator_llm,
+        "plan_outline_llm": get_plan_outline_llm,
+        "information_update_chain": get_information_update_chain,
+        "summary_chain": get_summary_chain,
+        "token_encoding": get_token_encoding,
+    })
+
+
+@app.on_event("shutdown")
+async def shutdown_plan_job_workers():
+    await stop_plan_workers()
+
+
+@app.post("/plan-jobs/{trip_id}", status_code=202)
+async def enqueue_plan_generation(trip_id: str, bypass_cache: bool = False, mode: str = "auto"):
+    """
+    Queue plan generation and return at once. Poll /plan-jobs/{job_id} or
+    subscribe to /plan-jobs/{job_id}/events for the result. A trip that
+    already has a queued or running job gets that job back.
+    """
+    check_plan_mode(mode)
+    if not ObjectId.is_valid(trip_id) or not await trips_col.find_one({"_id": ObjectId(trip_id)}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    job, created = await enqueue_plan_job(trip_id, {"bypass_cache": bypass_cache, "mode": mode})
+    return {"job_id": str(job["_id"]), "state": job["state"], "created": created}
+
+
+@app.get("/plan-jobs/{job_id}")
+async def plan_job_status(job_id: str):
+    job = await get_plan_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
+
+
+@app.get("/plan-jobs/{job_id}/events")
+async def plan_job_events(job_id: str):
+    if not await get_plan_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for job in watch_plan_job(job_id):
+            yield sse_event(job["state"], serialize_job(job))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-    print(f"✅ Background plan update done for trip_id: {trip_id}")
-    print(current_plan)
+
+@app.get("/plan-jobs")
+async def plan_job_stats():
+    return await get_plan_job_stats()
+
+
+@app.get("/llm-governor")
+async def llm_governor_stats():
+    return get_governor_stats()
+
+
+@app.get("/startup")
+async def startup_report():
+    return get_startup_report()
+
+
+@app.get("/information-updates/queue")
+async def information_update_queue():
+    return get_update_queue_stats()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,282 @@
+import json
+import math
+
+
+class JsonRepairError(ValueError):
+    pass
+
+
+_LITERALS = {
+    "null": "null", "None": "null", "undefined": "null", "NaN": "null", "Infinity": "null",
+    "true": "true", "True": "true",
+    "false": "false", "False": "false",
+}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+_NUMBER_START_CHARS = set("0123456789+-.")
+_NUMBER_CHARS = _NUMBER_START_CHARS | set("eE")
+_WORD_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$")
+
+
+def _skip_spaces(text: str, k: int) -> int:
+    while k < len(text) and text[k] in " \t\r\n":
+        k += 1
+    return k
+
+
+def _starts_key(text: str, k: int) -> bool:
+    """
+    Whether a key (quoted or bare) followed by a colon starts at `k`.
+    Running out of text counts as yes - the document may be truncated there.
+    """
+    n = len(text)
+    if k >= n or text[k] in "}/#":
+        return True
+    if text[k] in "\"'":
+        quote = text[k]
+        k += 1
+        while k < n and text[k] != quote:
+            if text[k] == "\n":
+                return False
+            k += 2 if text[k] == "\\" else 1
+        k += 1
+    elif text[k] in _WORD_CHARS:
+        while k < n and text[k] in _WORD_CHARS:
+            k += 1
+    else:
+        return False
+    k = _skip_spaces(text, k)
+    return k >= n or text[k] == ":"
+
+
+def _starts_value(text: str, k: int) -> bool:
+    if k >= len(text) or text[k] in "\"'{[]/#" or text[k] in _NUMBER_START_CHARS:
+        return True
+    j = k
+    while j < len(text) and text[j] in _WORD_CHARS:
+        j += 1
+    return text[k:j] in _LITERALS
+
+
+def _ends_string(text: str, k: int, container) -> bool:
+    """
+    Whether the quote just before `k` closes the string being read. It does
+    when JSON structure follows; after a comma, only if the next key (in an
+    object) or the next value (in an array) really starts there.
+    """
+    k_after = _skip_spaces(text, k)
+    if k_after >= len(text) or "\n" in text[k:k_after]:
+        return True
+    ch = text[k_after]
+    if ch == ",":
+        following = _skip_spaces(text, k_after + 1)
+        if container == "{":
+            return _starts_key(text, following)
+        if container == "[":
+            return _starts_value(text, following)
+        return True
+    return ch in '}]:"\'/#'
+
+
+def _read_string(text: str, i: int, quote: str, container=None):
+    """
+    Read a string starting at the quote at `i`. Returns (value, next index).
+    A quote only ends the string if what follows looks like JSON structure,
+    so stray quotes inside text survive. Raw newlines are kept as text.
+    `container` is "{" for an object value, "[" for an array item.
+    """
+    n = len(text)
+    chars = []
+    j = i + 1
+    while j < n:
+        ch = text[j]
+        if ch == "\\" and j + 1 < n:
+            nxt = text[j + 1]
+            hex_digits = text[j + 2:j + 6]
+            if nxt == "u" and len(hex_digits) == 4:
+                try:
+                    chars.append(chr(int(hex_digits, 16)))
+                    j += 6
+                    continue
+                except ValueError:
+                    pass
+            chars.append(_ESCAPES.get(nxt, nxt))
+            j += 2
+            continue
+        if ch == quote and (j + 1 == n or text[j + 1] in "}]:" or _ends_string(text, j + 1, container)):
+            return "".join(chars), j + 1
+        chars.append(ch)
+        j += 1
+    # Truncated inside a string
+    return "".join(chars).rstrip(), n
+
+
+def _skip_comment(text: str, i: int) -> int:
+    if text.startswith("/*", i):
+        end = text.find("*/", i + 2)
+        return len(text) if end == -1 else end + 2
+    end = text.find("\n", i)
+    return len(text) if end == -1 else end + 1
+
+
+def repair_json(text: str) -> str:
+    """
+    Turn almost-JSON written by an LLM into valid JSON text. Handles code
+    fences and text around the document, comments, trailing or missing
+    commas, Python literals, single quotes, unquoted keys, raw newlines in
+    strings and documents cut off mid-way.
+    """
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    if not starts:
+        raise JsonRepairError("No JSON object or array found")
+
+    out = []
+    stack = []   # "{" or "["
+    states = []  # key / colon / value / comma
+
+    def before_value():
+        if not stack:
+            return
+        state = states[-1]
+        if state == "comma":
+            out.append(",")
+            state = "key" if stack[-1] == "{" else "value"
+        if stack[-1] == "{" and state == "colon":
+            out.append(":")
+            state = "value"
+        if stack[-1] == "{" and state == "key":
+            # A value where a key belongs - give it a placeholder key
+            out.append('"":')
+            state = "value"
+        states[-1] = state
+
+    def value_done():
+        if stack:
+            states[-1] = "comma"
+
+    def emit_key_or_value(encoded: str):
+        if stack and stack[-1] == "{":
+            if states[-1] == "comma":
+                out.append(",")
+                states[-1] = "key"
+            if states[-1] == "key":
+                out.append(encoded)
+                states[-1] = "colon"
+                return
+        before_value()
+        out.append(encoded)
+        value_done()
+
+    def close_top():
+        opener = stack.pop()
+        state = states.pop()
+        if opener == "{" and state == "colon":
+            out.append(":null")
+        elif opener == "{" and state == "value":
+            out.append("null")
+        if out and out[-1] == ",":
+            out.pop()
+        out.append("}" if opener == "{" else "]")
+        value_done()
+
+    i = min(starts)
+    n = len(text)
+    while i < n:
+        if not stack and out:
+            break
+        c = text[i]
+
+        if c in " \t\r\n":
+            i += 1
+        elif c == "/" and text.startswith(("//", "/*"), i):
+            i = _skip_comment(text, i)
+        elif c == "#":
+            i = _skip_comment(text, i)
+        elif c in "{[":
+            before_value()
+            out.append(c)
+            stack.append(c)
+            states.append("key" if c == "{" else "value")
+            i += 1
+        elif c in "}]":
+            opener = "{" if c == "}" else "["
+            if opener in stack:
+                while stack[-1] != opener:
+                    close_top()
+                close_top()
+            i += 1
+        elif c == ",":
+            if stack and states[-1] == "comma":
+                out.append(",")
+                states[-1] = "key" if stack[-1] == "{" else "value"
+            i += 1
+        elif c == ":":
+            if stack and stack[-1] == "{" and states[-1] == "colon":
+                out.append(":")
+                states[-1] = "value"
+            i += 1
+        elif c in "\"'":
+            # Keys end at the first plausible quote, values look further ahead
+            container = None
+            if stack and not (stack[-1] == "{" and states[-1] in ("key", "comma")):
+                container = stack[-1]
+            value, i = _read_string(text, i, c, container)
+            emit_key_or_value(json.dumps(value, ensure_ascii=False))
+        elif c in _NUMBER_START_CHARS:
+            j = i
+            while j < n and text[j] in _NUMBER_CHARS:
+                j += 1
+            token = text[i:j]
+            try:
+                number = int(token)
+            except ValueError:
+                try:
+                    number = float(token)
+                except ValueError:
+                    number = None
+            if isinstance(number, float) and not math.isfinite(number):
+                number = None
+            before_value()
+            out.append(json.dumps(number))
+            value_done()
+            i = j
+        elif c in _WORD_CHARS:
+            j = i
+            while j < n and text[j] in _WORD_CHARS:
+                j += 1
+            word = text[i:j]
+            if stack and stack[-1] == "{" and states[-1] in ("key", "comma"):
+                emit_key_or_value(json.dumps(word))
+            else:
+                before_value()
+                out.append(_LITERALS.get(word, json.dumps(word)))
+                value_done()
+            i = j
+        else:
+            i += 1
+
+    # Truncated document - close whatever is still open
+    while stack:
+        close_top()
+
+    return "".join(out)
+
+
+def parse_llm_json(text: str):
+    """
+    json.loads for model output: tries the document as-is first and only
+    falls back to repair_json when that fails.
+    """
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    if starts:
+        start = min(starts)
+        end = max(text.rfind("}"), text.rfind("]")) + 1
+        try:
+            return json.loads(text[start:end])
+        except ValueError:
+            pass
+
+    repaired = repair_json(text)
+    try:
+        return json.loads(repaired)
+    except ValueError as e:
+        raise JsonRepairError(f"Could not repair JSON: {e}") from e
@@ -0,0 +1,82 @@
+import json
+
+
+class DailyPlanStreamParser:
+    """
+    Incremental scanner for a streamed plan JSON. Feed it chunks of model
+    output; it returns every `daily_plan[i]` object as soon as its closing
+    brace arrives, without waiting for the rest of the document.
+    """
+
+    def __init__(self, parse=json.loads):
+        self.parse = parse
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._pending_key = None
+        self._days_depth = None
+        self._day_start = None
+        self._day_index = 0
+
+    def feed(self, chunk: str) -> list:
+        """
+        Consume a chunk and return a list of (index, day) for days completed in it.
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        while self._pos < len(text):
+            char = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:self._pos]
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = self._pos + 1
+            elif char == ":":
+                self._pending_key = self._last_string
+            elif char == ",":
+                self._pending_key = None
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._pending_key == "daily_plan":
+                    self._days_depth = self._depth + 1
+                elif char == "{" and self._days_depth is not None and self._depth == self._days_depth:
+                    self._day_start = self._pos
+                self._depth += 1
+                self._pending_key = None
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._day_start is not None and self._depth == self._days_depth:
+                    day = self._parse_day(text[self._day_start:self._pos + 1])
+                    if day is not None:
+                        completed.append((self._day_index, day))
+                    self._day_index += 1
+                    self._day_start = None
+                elif char == "]" and self._days_depth is not None and self._depth == self._days_depth - 1:
+                    self._days_depth = None
+
+            self._pos += 1
+
+        return completed
+
+    def _parse_day(self, day_text: str):
+        try:
+            day = self.parse(day_text)
+        except Exception as e:
+            print(f"⚠️ Could not parse streamed day: {e}")
+            return None
+        return day if isinstance(day, dict) else None
@@ -93,3 +93,78 @@ def get_empty_plan2():
     }
 ]
 }"""
+
+
+def validate_travel_information(data, skeleton=..., path=""):
+    """
+    Check that `data` has the shape of get_empty_travel_information():
+    only known keys, lists where lists are expected, objects where objects
+    are expected. Raises ValueError naming the first offending path.
+    """
+    if skeleton is ...:
+        skeleton = get_empty_travel_information()
+
+    if isinstance(skeleton, dict):
+        if not isinstance(data, dict):
+            raise ValueError(f"{path or '/'} must be an object")
+        for key, value in data.items():
+            if key not in skeleton:
+                raise ValueError(f"Unknown field {path}/{key}")
+            validate_travel_information(value, skeleton[key], f"{path}/{key}")
+    elif isinstance(skeleton, list):
+        if not isinstance(data, list):
+            raise ValueError(f"{path} must be a list")
+        item_skeleton = skeleton[0] if skeleton else None
+        for index, item in enumerate(data):
+            validate_travel_information(item, item_skeleton, f"{path}/{index}")
+    elif isinstance(data, dict) or (isinstance(data, list) and any(isinstance(item, (dict, list)) for item in data)):
+        # Plain fields hold a value or a short list of values (e.g. preferences)
+        raise ValueError(f"{path} must be a single value")
+
+
+def _shape_at(data, pointer: str, original):
+    """
+    (value, skeleton, path) at a JSON pointer, stopping at a plain field.
+    None when there is nothing to check: the value is gone, or it sits under
+    a field the skeleton does not know but `original` already had.
+    """
+    skeleton = get_empty_travel_information()
+    value, before, path = data, original, ""
+    tokens = [token.replace("~1", "/").replace("~0", "~") for token in pointer.split("/")[1:]] if pointer else []
+    for token in tokens:
+        if isinstance(skeleton, dict):
+            if token not in skeleton:
+                if isinstance(before, dict) and token in before:
+                    return None
+                raise ValueError(f"Unknown field {path}/{token}")
+            if not isinstance(value, dict) or token not in value:
+                return None
+            value, skeleton = value[token], skeleton[token]
+            before = before.get(token) if isinstance(before, dict) else None
+        elif isinstance(skeleton, list):
+            if not isinstance(value, list) or not value:
+                return None
+            index = len(value) - 1 if token == "-" else int(token)
+            if not 0 <= index < len(value):
+                return None
+            # List items are not matched with the old document
+            value, skeleton, before = value[index], skeleton[0] if skeleton else None, None
+            token = str(index)
+        else:
+            # Inside a plain field - it is checked as a whole
+            break
+        path = f"{path}/{token}"
+    return value, skeleton, path
+
+
+def validate_travel_information_paths(data, pointers, original=None):
+    """
+    validate_travel_information for the values at `pointers` only (the
+    targets of a patch), so legacy or extra fields elsewhere in a trip do not
+    block its updates. Unknown fields that `original` already had are left
+    alone as well.
+    """
+    for pointer in pointers:
+        found = _shape_at(data, pointer, original)
+        if found is not None:
+            validate_travel_information(*found)